@@ -1,38 +1,166 @@
 import asyncio
+import mimetypes
 from os.path import abspath, dirname, join
 from types import FunctionType
 
-from aiohttp import web
+from aiohttp import hdrs, web
 
-from .helpers import (generate_doc_from_each_end_point,
+from .helpers import (build_swagger_index, fingerprint_routes,
                       load_doc_from_yaml_file, swagger_path)
+from .helpers.admission import AdmissionControl
+from .helpers.artifact import SharedArtifactCache, load_artifact
+from .helpers.compression import (ENCODING_EXTENSIONS, available_encodings,
+                                  select_encoding)
+from .helpers.definition import BUILD_MODES, SwaggerDefinition
+from .helpers.mounts import (DEFAULT_IN_MEMORY_EXCLUDE, SwaggerMount,
+                             SwaggerStatic, swagger_mounts)
+from .helpers.responses import (FileBody, IdempotentFileResponse,
+                                PreparedBody, StreamedBody, file_response,
+                                prepared_response, streamed_response)
+from .helpers.serialization import dumps_canonical
+from .helpers.validation import swagger_validation_middleware
+from .helpers.static import IMMUTABLE_CACHE_CONTROL
 
-try:
-    import ujson as json
-except ImportError:
-    import json
+
+def _registered(request):
+    """
+    The SwaggerMount (or SwaggerStatic) of the matched documentation route
+    """
+    return request.app["SWAGGER_RESOURCES"][request.match_info.route.resource]
 
 
 async def _swagger_home(request):
     """
     Return the index.html main file
     """
-    return web.Response(
-        text=request.app["SWAGGER_TEMPLATE_CONTENT"],
-        content_type="text/html"
-    )
+    return prepared_response(request, _registered(request).template_body)
 
 
 async def _swagger_def(request):
     """
-    Returns the Swagger JSON Definition
+    Returns the Swagger JSON Definition, or the definition of a single tag
+    (`?tag=`) when tag shards are enabled
+    """
+    swagger_def = _registered(request).definition
+    body = await swagger_def.get()
+    if "tag" in request.query and swagger_def.shards is not None:
+        body = swagger_def.shards.get(request.query["tag"])
+        if body is None:
+            raise web.HTTPNotFound()
+    if isinstance(body, StreamedBody):
+        return await streamed_response(request, body)
+    if isinstance(body, FileBody):
+        return file_response(request, body)
+    return prepared_response(request, body)
+
+
+async def _swagger_tags(request):
+    """
+    Returns the index of the per-tag definitions
+    """
+    shards = await _registered(request).definition.get_shards()
+    return prepared_response(request, shards.index)
+
+
+async def _swagger_tag(request):
+    """
+    Returns the Swagger JSON Definition of a single tag
+    """
+    shards = await _registered(request).definition.get_shards()
+    body = shards.get(request.match_info["tag"])
+    if body is None:
+        raise web.HTTPNotFound()
+    return prepared_response(request, body)
+
+
+async def _swagger_static(request):
+    """
+    Serve a Swagger UI asset, using a precompressed sibling when the client
+    accepts it
+    """
+    static = _registered(request)
+    filename = request.match_info["filename"]
+    if static.bodies is not None:
+        # Loaded in memory: no filesystem access
+        body = static.bodies.get(filename)
+        if body is not None:
+            return prepared_response(request, body)
+
+    # Left out of memory (source maps, ...): served from disk
+    headers = {}
+
+    # Content-hashed URL: the bytes behind it can never change
+    if filename in static.fingerprints:
+        filename = static.fingerprints[filename]
+        headers[hdrs.CACHE_CONTROL] = IMMUTABLE_CACHE_CONTROL
+
+    try:
+        encodings = static.files[filename]
+    except KeyError:
+        raise web.HTTPNotFound()
+
+    path = join(static.path, filename)
+    content_type = mimetypes.guess_type(filename)[0]
+    headers[hdrs.CONTENT_TYPE] = content_type or "application/octet-stream"
+
+    if encodings:
+        headers[hdrs.VARY] = hdrs.ACCEPT_ENCODING
+        encoding = select_encoding(
+            request.headers.get(hdrs.ACCEPT_ENCODING, ""), encodings)
+        if encoding is not None:
+            path += ENCODING_EXTENSIONS[encoding]
+            headers[hdrs.CONTENT_ENCODING] = encoding
+
+    return IdempotentFileResponse(path, headers=headers)
+
+
+def _admitted(handler):
+    """
+    Answer with `handler` within the admission control of the matched mount,
+    if any
+    """
+    async def _handler(request):
+        admission = _registered(request).admission
+        if admission is None:
+            return await handler(request)
+        return await admission.admit(request, handler)
+    _handler.swagger_ignore = True
+    return _handler
+
+
+# The documentation end-points must not document themselves
+for _handler in (_swagger_home, _swagger_def, _swagger_tags, _swagger_tag,
+                 _swagger_static):
+    _handler.swagger_ignore = True
+
+
+async def _swagger_on_startup(app):
+    for mount in swagger_mounts(app).values():
+        if mount.build == "background":
+            mount.definition.start()
+        if mount.refresh_on_startup:
+            mount.definition.refresh()
+
+
+def refresh_swagger(app: web.Application) -> bool:
+    """
+    Update the Swagger definitions of `app` with the routes added (or
+    removed) since they were built. Only the changed path items are parsed
+    and serialized again. Returns whether a definition changed.
     """
-    return web.json_response(text=request.app["SWAGGER_DEF_CONTENT"])
+    changed = False
+    for mount in swagger_mounts(app).values():
+        changed = mount.definition.refresh() or changed
+    if changed and "SWAGGER_DEF_CONTENT" in app:
+        # The key of the first mount, from before several mounts
+        app["SWAGGER_DEF_CONTENT"] = app["SWAGGER_DEF"].content
+    return changed
 
 
 def setup_swagger(app: web.Application,
                   *,
                   swagger_from_file: str = None,
+                  swagger_from_artifact: str = None,
                   swagger_url: str = "/api/doc",
                   api_base_url: str = "/",
                   swagger_validator_url: str = "",
@@ -46,66 +174,229 @@ def setup_swagger(app: web.Application,
                   swagger_info: dict = None,
                   swagger_template_path: str = None,
                   definitions: dict = None,
-                  security_definitions: dict = None):
+                  security_definitions: dict = None,
+                  swagger_def_cache_control: str = "no-cache",
+                  static_fingerprint: bool = False,
+                  build: str = "eager",
+                  yaml_cache_dir: str = None,
+                  parse_workers: int = 1,
+                  refresh_on_startup: bool = False,
+                  tag_shards: bool = False,
+                  swagger_def_stream: bool = False,
+                  swagger_def_sendfile_path: str = None,
+                  swagger_def_compress: bool = False,
+                  swagger_def_compressed_only: bool = False,
+                  trace: FunctionType = None,
+                  validate_requests: bool = False,
+                  shared_cache_dir: str = None,
+                  route_prefix: str = None,
+                  static_in_memory: bool = False,
+                  static_in_memory_exclude: tuple = DEFAULT_IN_MEMORY_EXCLUDE,
+                  admission: AdmissionControl = None,
+                  api_app: web.Application = None):
     _swagger_url = ("/{}".format(swagger_url)
                     if not swagger_url.startswith("/")
                     else swagger_url)
     _base_swagger_url = _swagger_url.rstrip('/')
     _swagger_def_url = '{}/swagger.json'.format(_base_swagger_url)
+    _swagger_tags_url = '{}/tags.json'.format(_base_swagger_url)
+    _swagger_tag_url = '{}/tags/{{}}.json'.format(_base_swagger_url)
 
     if ui_version == 3:
         STATIC_PATH = abspath(join(dirname(__file__), "swagger_ui3"))
     else:
         STATIC_PATH = abspath(join(dirname(__file__), "swagger_ui"))
 
+    # The application whose routes are documented
+    if api_app is None:
+        api_app = app
+
+    if "SWAGGER_MOUNTS" not in app:
+        # Shared by every setup_swagger call on the application
+        app["SWAGGER_MOUNTS"] = {}
+        app["SWAGGER_STATICS"] = {}
+        app["SWAGGER_RESOURCES"] = {}
+        app.on_startup.append(_swagger_on_startup)
+    if _base_swagger_url in app["SWAGGER_MOUNTS"]:
+        raise ValueError("Swagger documentation is already mounted on "
+                         "{}".format(_swagger_url))
+
+    if build not in BUILD_MODES:
+        raise ValueError("build must be one of: {}".format(
+            ", ".join(BUILD_MODES)))
+
+    if validate_requests and (swagger_info is not None or swagger_from_file
+                              or swagger_from_artifact):
+        raise ValueError("validate_requests needs a definition built from "
+                         "the routes")
+    if validate_requests and shared_cache_dir is not None:
+        raise ValueError("validate_requests can not be combined with "
+                         "shared_cache_dir")
+    if validate_requests and api_app is not app:
+        raise ValueError("validate_requests needs the documentation on the "
+                         "application it validates")
+
+    if swagger_def_compressed_only:
+        swagger_def_compress = True
+    if swagger_def_compress and swagger_def_stream:
+        raise ValueError("swagger_def_compress can not be combined with "
+                         "swagger_def_stream")
+
+    shared_cache = None
+    if shared_cache_dir is not None:
+        shared_cache = SharedArtifactCache(shared_cache_dir)
+        if refresh_on_startup:
+            # Loaded rather than indexed, a shared definition can not be
+            # refreshed: build it once the routes are complete instead
+            refresh_on_startup = False
+            if build == "eager":
+                build = "background"
+
+    if swagger_info is not None:
+        swagger_info = dumps_canonical(swagger_info)
+        build = "eager"
+    if swagger_from_artifact:
+        # Loaded right away: a later build would replace it with the routes
+        build = "eager"
+
+    # Everything the generated definition depends on, besides the routes
+    build_options = dict(
+        ui_version=ui_version,
+        api_base_url=api_base_url, description=description,
+        api_version=api_version, title=title, contact=contact,
+        template_path=swagger_template_path,
+        definitions=definitions,
+        security_definitions=security_definitions)
+
+    def _build_swagger_index():
+        return build_swagger_index(
+            api_app, yaml_cache_dir=yaml_cache_dir,
+            parse_workers=parse_workers,
+            trace=trace, route_prefix=route_prefix,
+            # Streamed or written to a file: serialized when needed, never
+            # kept
+            keep_fragments=not (swagger_def_stream or
+                                swagger_def_sendfile_path),
+            **build_options)
+
     # Build Swagget Info
-    if swagger_info is None:
+    def _build_swagger_info():
+        if swagger_info is not None:
+            return swagger_info
         if swagger_from_file:
-            swagger_info = load_doc_from_yaml_file(swagger_from_file)
-        else:
-            swagger_info = generate_doc_from_each_end_point(
-                app, ui_version=ui_version,
-                api_base_url=api_base_url, description=description,
-                api_version=api_version, title=title, contact=contact,
-                template_path=swagger_template_path,
-                definitions=definitions,
-                security_definitions=security_definitions
-            )
-    else:
-        swagger_info = json.dumps(swagger_info)
+            return load_doc_from_yaml_file(swagger_from_file)
+        if shared_cache is not None:
+            return shared_cache.load(
+                fingerprint_routes(api_app, route_prefix=route_prefix,
+                                   **build_options),
+                lambda: _build_swagger_index().dumps(),
+                cache_control=swagger_def_cache_control, trace=trace)
+        return _build_swagger_index()
+
+    swagger_def = SwaggerDefinition(
+        _build_swagger_info, cache_control=swagger_def_cache_control,
+        shard_url=('{}{}'.format(api_base_url.rstrip('/'), _swagger_tag_url)
+                   if tag_shards else None),
+        stream=swagger_def_stream, trace=trace, validate=validate_requests,
+        sendfile_path=swagger_def_sendfile_path,
+        encodings=available_encodings() if swagger_def_compress else (),
+        compressed_only=swagger_def_compressed_only)
+    if swagger_from_artifact:
+        # Prebuilt with `python -m aiohttp_swagger build`: nothing to parse
+        swagger_def.set_body(load_artifact(
+            swagger_from_artifact, cache_control=swagger_def_cache_control))
+    elif build == "eager":
+        swagger_def.build_now()
+
+    if validate_requests and \
+            swagger_validation_middleware not in app.middlewares:
+        app.middlewares.append(swagger_validation_middleware)
+
+    # Mounts of the same Swagger UI version share its assets
+    static = app["SWAGGER_STATICS"].get(STATIC_PATH)
+    if static is None:
+        static = SwaggerStatic(
+            STATIC_PATH, '{}/swagger_static'.format(_base_swagger_url))
+        app["SWAGGER_STATICS"][STATIC_PATH] = static
+        route = app.router.add_get('{}/{{filename:.+}}'.format(static.url),
+                                   _admitted(_swagger_static))
+        app["SWAGGER_RESOURCES"][route.resource] = static
+    if static.admission is None:
+        static.admission = admission
+    if static_in_memory:
+        static.load(exclude=static_in_memory_exclude, trace=trace)
+
+    mount = SwaggerMount(_swagger_url, swagger_def, static, build=build,
+                         refresh_on_startup=refresh_on_startup,
+                         admission=admission)
+    app["SWAGGER_MOUNTS"][_base_swagger_url] = mount
 
     _swagger_home_func = _swagger_home
     _swagger_def_func = _swagger_def
+    _swagger_tags_func = _swagger_tags
+    _swagger_tag_func = _swagger_tag
 
     if swagger_home_decor is not None:
         _swagger_home_func = swagger_home_decor(_swagger_home)
 
     if swagger_def_decor is not None:
         _swagger_def_func = swagger_def_decor(_swagger_def)
+        _swagger_tags_func = swagger_def_decor(_swagger_tags)
+        _swagger_tag_func = swagger_def_decor(_swagger_tag)
 
     # Add API routes
-    app.router.add_route('GET', _swagger_url, _swagger_home_func)
-    app.router.add_route('GET', "{}/".format(_base_swagger_url),
-                         _swagger_home_func)
-    app.router.add_route('GET', _swagger_def_url, _swagger_def_func)
-
-    # Set statics
-    statics_path = '{}/swagger_static'.format(_base_swagger_url)
-    app.router.add_static(statics_path, STATIC_PATH)
+    _swagger_home_func = _admitted(_swagger_home_func)
+    routes = [
+        app.router.add_route('GET', _swagger_url, _swagger_home_func),
+        app.router.add_route('GET', "{}/".format(_base_swagger_url),
+                             _swagger_home_func),
+        app.router.add_get(_swagger_def_url, _admitted(_swagger_def_func)),
+    ]
+    if tag_shards:
+        routes.append(app.router.add_get(_swagger_tags_url,
+                                         _admitted(_swagger_tags_func)))
+        routes.append(app.router.add_get(_swagger_tag_url.format('{tag:.+}'),
+                                         _admitted(_swagger_tag_func)))
+    for route in routes:
+        app["SWAGGER_RESOURCES"][route.resource] = mount
 
     # --------------------------------------------------------------------------
     # Build templates
     # --------------------------------------------------------------------------
-    app["SWAGGER_DEF_CONTENT"] = swagger_info
-    with open(join(STATIC_PATH, "index.html"), "r") as f:
-        app["SWAGGER_TEMPLATE_CONTENT"] = (
-            f.read()
-            .replace("##SWAGGER_CONFIG##", '{}{}'.
-                     format(api_base_url.rstrip('/'), _swagger_def_url))
-            .replace("##STATIC_PATH##", '{}{}'.
-                     format(api_base_url.rstrip('/'), statics_path))
-            .replace("##SWAGGER_VALIDATOR_URL##", swagger_validator_url)
-        )
-
-
-__all__ = ("setup_swagger", "swagger_path")
+    mount.template_content = (
+        static.template(fingerprint=static_fingerprint)
+        .replace("##SWAGGER_CONFIG##", '{}{}'.
+                 format(api_base_url.rstrip('/'), _swagger_def_url))
+        .replace("##STATIC_PATH##", '{}{}'.
+                 format(api_base_url.rstrip('/'), static.url))
+        .replace("##SWAGGER_VALIDATOR_URL##", swagger_validator_url)
+    )
+    mount.template_body = PreparedBody.from_text(mount.template_content,
+                                                 "text/html")
+
+    # The keys of the first mount, from before several mounts were possible
+    if "SWAGGER_DEF" not in app:
+        app["SWAGGER_DEF"] = swagger_def
+        if build == "eager" and not swagger_from_artifact:
+            app["SWAGGER_DEF_CONTENT"] = swagger_def.content
+        app["SWAGGER_TEMPLATE_CONTENT"] = mount.template_content
+
+
+def create_swagger_app(api_app: web.Application = None,
+                       **kwargs) -> web.Application:
+    """
+    A standalone application serving the documentation of `api_app` (or an
+    artifact, `swagger_from_artifact=...`), to run on its own port or in
+    its own process: the API workers then serve no documentation at all.
+    `kwargs` are the options of `setup_swagger`.
+
+    It has no middlewares. Its definition is built from the routes of
+    `api_app`: add them first, or `refresh_swagger` it afterwards.
+    """
+    app = web.Application()
+    setup_swagger(app, api_app=api_app, **kwargs)
+    return app
+
+
+__all__ = ("setup_swagger", "refresh_swagger", "create_swagger_app",
+           "swagger_path")
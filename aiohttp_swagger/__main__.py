@@ -0,0 +1,181 @@
+"""
+Command line tools of aiohttp-swagger.
+
+    python -m aiohttp_swagger build my.module:app_factory -o dist/swagger.json
+    python -m aiohttp_swagger serve dist/swagger.json --port 8081
+"""
+import argparse
+import asyncio
+import importlib
+import inspect
+import json
+import sys
+
+from aiohttp import web
+
+from . import create_swagger_app
+from .helpers import build_swagger_index
+from .helpers.artifact import write_artifact
+from .helpers.responses import FileBody, StreamedBody
+
+
+def load_app(target: str, loop) -> web.Application:
+    """
+    Import `module:attribute`, where the attribute is an application or a
+    factory (possibly a coroutine function) returning one
+    """
+    module_name, _, attribute = target.partition(":")
+    if not attribute:
+        raise ValueError(
+            "Application must be given as 'module:attribute', not {!r}".format(
+                target))
+
+    obj = importlib.import_module(module_name)
+    for name in attribute.split("."):
+        obj = getattr(obj, name)
+
+    if not isinstance(obj, web.Application):
+        obj = obj()
+        if inspect.isawaitable(obj):
+            obj = loop.run_until_complete(obj)
+
+    if not isinstance(obj, web.Application):
+        raise TypeError("{} did not give an aiohttp Application".format(
+            target))
+    return obj
+
+
+def build_definition(app: web.Application, options) -> bytes:
+    # Reuse the definition of setup_swagger, with its own options, when the
+    # application already has one
+    swagger_def = app.get("SWAGGER_DEF")
+    if swagger_def is not None:
+        if swagger_def.body is None:
+            swagger_def.build_now()
+        if isinstance(swagger_def.body, StreamedBody):
+            return b"".join(swagger_def.body.chunks())
+        if isinstance(swagger_def.body, FileBody):
+            with open(swagger_def.body.path, "rb") as f:
+                return f.read()
+        return swagger_def.body.body
+
+    definitions = None
+    if options.definitions:
+        with open(options.definitions) as f:
+            definitions = json.load(f)
+
+    return build_swagger_index(
+        app,
+        ui_version=options.ui_version,
+        api_base_url=options.api_base_url,
+        description=options.description,
+        api_version=options.api_version,
+        title=options.title,
+        contact=options.contact,
+        template_path=options.template_path,
+        definitions=definitions,
+        parse_workers=options.parse_workers
+    ).dumps().encode("utf-8")
+
+
+def _build(options):
+    loop = asyncio.new_event_loop()
+    try:
+        asyncio.set_event_loop(loop)
+        app = load_app(options.app, loop)
+        content = build_definition(app, options)
+    finally:
+        loop.close()
+
+    digest = write_artifact(content, options.output)
+    print("{}: {} bytes, sha256 {}".format(
+        options.output, len(content), digest))
+
+
+def sidecar_app(options, loop) -> web.Application:
+    """
+    The documentation application of `serve`: an artifact is loaded as it
+    is, an application is imported to build its definition from its routes
+    """
+    kwargs = dict(swagger_url=options.swagger_url,
+                  api_base_url=options.api_base_url,
+                  ui_version=options.ui_version,
+                  static_in_memory=options.static_in_memory,
+                  swagger_def_compress=options.compress)
+    if ":" not in options.source:
+        return create_swagger_app(swagger_from_artifact=options.source,
+                                  **kwargs)
+
+    definitions = None
+    if options.definitions:
+        with open(options.definitions) as f:
+            definitions = json.load(f)
+    return create_swagger_app(
+        load_app(options.source, loop),
+        description=options.description,
+        api_version=options.api_version,
+        title=options.title,
+        contact=options.contact,
+        swagger_template_path=options.template_path,
+        definitions=definitions,
+        parse_workers=options.parse_workers,
+        **kwargs)
+
+
+def _serve(options):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    app = sidecar_app(options, loop)
+    web.run_app(app, host=options.host, port=options.port)
+
+
+def _add_definition_options(parser):
+    parser.add_argument("--ui-version", type=int, default=None)
+    parser.add_argument("--api-base-url", default="/")
+    parser.add_argument("--description", default="Swagger API definition")
+    parser.add_argument("--api-version", default="1.0.0")
+    parser.add_argument("--title", default="Swagger API")
+    parser.add_argument("--contact", default="")
+    parser.add_argument("--template-path", default=None)
+    parser.add_argument("--definitions", default=None,
+                        help="JSON file with the data definitions")
+    parser.add_argument("--parse-workers", type=int, default=1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m aiohttp_swagger")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    build = commands.add_parser(
+        "build",
+        help="build swagger.json ahead of time, to be loaded with "
+             "setup_swagger(swagger_from_artifact=...)")
+    build.add_argument("app", help="module:attribute of the application, "
+                                   "or of a factory returning it")
+    build.add_argument("-o", "--output", default="swagger.json")
+    _add_definition_options(build)
+    build.set_defaults(func=_build)
+
+    serve = commands.add_parser(
+        "serve",
+        help="serve the documentation in its own process, away from the "
+             "event loop of the API")
+    serve.add_argument("source", help="swagger.json artifact written by "
+                                      "build, or module:attribute of the "
+                                      "application (or of a factory)")
+    serve.add_argument("--host", default=None)
+    serve.add_argument("--port", type=int, default=8081)
+    serve.add_argument("--swagger-url", default="/api/doc")
+    serve.add_argument("--static-in-memory", action="store_true")
+    serve.add_argument("--compress", action="store_true",
+                       help="precompress a definition built from the routes")
+    _add_definition_options(serve)
+    serve.set_defaults(func=_serve)
+
+    options = parser.parse_args(argv)
+    options.func(options)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
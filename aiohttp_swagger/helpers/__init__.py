@@ -1,2 +1,5 @@
+from .admission import *  # noqa
 from .builders import *  # noqa
+from .compression import *  # noqa
 from .decorators import *  # noqa
+from .tracing import *  # noqa
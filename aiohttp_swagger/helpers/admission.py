@@ -0,0 +1,162 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+
+from aiohttp import hdrs, web
+
+
+DEFAULT_MAX_CLIENTS = 10000
+
+
+class AdmissionControl(object):
+    """
+    Limits on the documentation requests, so that crawlers can not slow down
+    the API served by the same event loop.
+
+    - `rate` / `burst`: token bucket of each client, refilled with `rate`
+      requests per second up to `burst` requests. Beyond it, requests get
+      429 Too Many Requests.
+    - `max_in_flight`: documentation requests handled at the same time,
+      response sent included. Up to `max_queue` more wait for a slot, at
+      most `queue_timeout` seconds; the others get 503 Service Unavailable.
+
+    With `max_in_flight`, responses are sent by the documentation handlers:
+    the middlewares get them back already sent. Both answers carry a
+    Retry-After header. Clients are told apart by the
+    `client_header` header (`X-Forwarded-For` behind a proxy, ...) or by
+    their address; only the buckets of the `max_clients` most recent
+    clients are kept. `stats()` returns the counters, for monitoring.
+
+    The same instance can be given to several `setup_swagger` mounts, to
+    share its limits.
+    """
+
+    def __init__(self, rate: float = None, burst: int = None,
+                 max_in_flight: int = None, max_queue: int = 0,
+                 queue_timeout: float = None, retry_after: int = 1,
+                 client_header: str = None,
+                 max_clients: int = DEFAULT_MAX_CLIENTS,
+                 clock=time.monotonic):
+        if rate is not None and rate <= 0:
+            raise ValueError("The rate must be positive: {!r}".format(rate))
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, math.ceil(
+            rate or 1))
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.client_header = client_header
+        self.max_clients = max_clients
+        self._clock = clock
+
+        # client -> [tokens, time of the last update], least recent first
+        self._buckets = OrderedDict()
+        self._in_flight = 0
+        self._waiters = deque()
+        self.counters = {
+            "admitted": 0,
+            "queued": 0,
+            "rate_limited": 0,
+            "rejected": 0,
+            "timed_out": 0,
+        }
+
+    def client(self, request) -> str:
+        if self.client_header is not None:
+            value = request.headers.get(self.client_header)
+            if value:
+                # The first address of a proxy chain is the client
+                return value.split(",")[0].strip()
+        return request.remote
+
+    def _take_token(self, client: str):
+        now = self._clock()
+        bucket = self._buckets.pop(client, None)
+        if bucket is None:
+            bucket = [float(self.burst), now]
+        else:
+            bucket[0] = min(float(self.burst),
+                            bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        # Most recent last: the first one is evicted
+        self._buckets[client] = bucket
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+
+        if bucket[0] < 1:
+            self.counters["rate_limited"] += 1
+            raise web.HTTPTooManyRequests(headers={
+                hdrs.RETRY_AFTER: str(math.ceil((1 - bucket[0]) /
+                                                self.rate))})
+        bucket[0] -= 1
+
+    def _unavailable(self, counter: str):
+        self.counters[counter] += 1
+        return web.HTTPServiceUnavailable(headers={
+            hdrs.RETRY_AFTER: str(self.retry_after)})
+
+    async def _take_slot(self):
+        if self._in_flight < self.max_in_flight:
+            self._in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._unavailable("rejected")
+
+        self.counters["queued"] += 1
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._unavailable("timed_out")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before the cancellation
+                self._release_slot()
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+
+    def _release_slot(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot goes to the waiter: `_in_flight` is unchanged
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    async def admit(self, request, handler):
+        """
+        Answer `request` with `handler` once the limits allow it
+        """
+        if self.rate is not None:
+            self._take_token(self.client(request))
+        if self.max_in_flight is None:
+            self.counters["admitted"] += 1
+            return await handler(request)
+
+        await self._take_slot()
+        self.counters["admitted"] += 1
+        try:
+            response = await handler(request)
+            # Sent while the slot is held, however large the body
+            await response.prepare(request)
+            await response.write_eof()
+            return response
+        finally:
+            self._release_slot()
+
+    def stats(self) -> dict:
+        return dict(self.counters, in_flight=self._in_flight,
+                    waiting=len(self._waiters), clients=len(self._buckets))
+
+
+__all__ = ("AdmissionControl",)
@@ -0,0 +1,191 @@
+import glob
+import hashlib
+import os
+from contextlib import contextmanager
+from os.path import basename, dirname, join
+
+from .compression import (ENCODING_EXTENSIONS, _write_atomic,
+                          available_encodings, compress)
+from .responses import PreparedBody
+from .tracing import traced_phase
+
+
+# Number of fingerprints a SharedArtifactCache keeps on disk
+DEFAULT_SHARED_KEEP = 4
+
+
+def write_artifact(content, path: str, encodings=None) -> str:
+    """
+    Write a prebuilt Swagger definition to `path`, with a `.sha256` file
+    (in `sha256sum` format) and precompressed siblings (`.gz`, `.br`).
+
+    Returns the SHA-256 hex digest of the definition.
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    if encodings is None:
+        encodings = available_encodings()
+
+    if dirname(path):
+        os.makedirs(dirname(path), exist_ok=True)
+
+    digest = hashlib.sha256(content).hexdigest()
+    for encoding in encodings:
+        _write_atomic(path + ENCODING_EXTENSIONS[encoding],
+                      compress(content, encoding))
+    _write_atomic(path, content)
+    # Written last: it marks the artifact as complete
+    _write_atomic(path + ".sha256", "{}  {}\n".format(
+        digest, basename(path)).encode("ascii"))
+    return digest
+
+
+def load_artifact(path: str, cache_control: str = "no-cache") -> PreparedBody:
+    """
+    Load a definition written by `write_artifact`, ready to be served
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+
+    body = PreparedBody(content, "application/json; charset=utf-8",
+                        cache_control=cache_control,
+                        last_modified=int(os.stat(path).st_mtime))
+
+    try:
+        with open(path + ".sha256", "r") as f:
+            expected = f.read().split()[0]
+    except FileNotFoundError:
+        pass
+    else:
+        # The ETag is the head of the same digest
+        if expected[:32] != body.etag.strip('"'):
+            raise ValueError(
+                "{} does not match its .sha256 file".format(path))
+
+    for encoding, extension in ENCODING_EXTENSIONS.items():
+        try:
+            with open(path + extension, "rb") as f:
+                body.add_encoding(encoding, f.read())
+        except FileNotFoundError:
+            continue
+    return body
+
+
+@contextmanager
+def _file_lock(path: str):
+    """
+    Hold an exclusive advisory lock on `path` for the `with` block
+    """
+    try:
+        import fcntl
+    except ImportError:  # pragma: no cover
+        # No flock (Windows): concurrent builds publish the same bytes
+        yield
+        return
+
+    try:
+        f = open(path, "a")
+    except OSError:
+        # Read-only directory: build without sharing
+        yield
+        return
+    with f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class SharedArtifactCache(object):
+    """
+    Definitions shared by the processes of a host (the pre-forked workers of
+    a server), stored as artifacts under `directory` and named after the
+    fingerprint of what they are built from (see `fingerprint_routes`).
+
+    The first process needing a definition builds and publishes it while
+    holding a lock on its fingerprint; the other ones wait for the lock,
+    then load the published bytes. Artifacts are written atomically, so an
+    interrupted build leaves nothing to load. Only the `keep` most recently
+    published fingerprints are kept.
+    """
+
+    def __init__(self, directory: str, encodings=None,
+                 keep: int = DEFAULT_SHARED_KEEP):
+        self.directory = directory
+        self.encodings = encodings
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, fingerprint: str) -> str:
+        return join(self.directory, "swagger-{}.json".format(fingerprint))
+
+    def _load(self, fingerprint: str, cache_control: str):
+        path = self.path(fingerprint)
+        # The .sha256 file is written last: without it, nothing is published
+        if not os.path.exists(path + ".sha256"):
+            return None
+        try:
+            return load_artifact(path, cache_control=cache_control)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, fingerprint: str, build, cache_control: str = "no-cache",
+             trace=None) -> PreparedBody:
+        """
+        Return the definition of `fingerprint`, calling `build()` (which
+        returns it as a JSON str) and publishing the result when no process
+        did it yet
+        """
+        with traced_phase(trace, "shared_cache") as details:
+            body = self._load(fingerprint, cache_control)
+            if body is None:
+                with _file_lock(self.path(fingerprint) + ".lock"):
+                    # Built by another process while we waited for the lock
+                    body = self._load(fingerprint, cache_control)
+                    if body is None:
+                        body = self._publish(fingerprint, build(),
+                                             cache_control)
+                        details["built"] = True
+            details.setdefault("built", False)
+            return body
+
+    def _publish(self, fingerprint: str, content: str, cache_control: str):
+        path = self.path(fingerprint)
+        try:
+            write_artifact(content, path, encodings=self.encodings)
+        except OSError:
+            # A read-only or full directory must not break the build
+            return PreparedBody.from_text(content, "application/json",
+                                          cache_control=cache_control)
+        self.prune()
+        # Loaded back, so that every process sends the same Last-Modified
+        return load_artifact(path, cache_control=cache_control)
+
+    def prune(self) -> int:
+        """
+        Remove the artifacts of all but the `keep` most recently published
+        fingerprints. Returns the number of removed fingerprints.
+        """
+        published = []
+        for marker in glob.glob(join(self.directory, "swagger-*.json.sha256")):
+            try:
+                published.append((os.stat(marker).st_mtime, marker))
+            except OSError:
+                continue
+
+        removed = 0
+        for _, marker in sorted(published, reverse=True)[self.keep:]:
+            path = marker[:-len(".sha256")]
+            for name in ([marker, path, path + ".lock"] +
+                         [path + extension
+                          for extension in ENCODING_EXTENSIONS.values()]):
+                try:
+                    os.remove(name)
+                except OSError:
+                    pass
+            removed += 1
+        return removed
+
+
+__all__ = ("load_artifact", "write_artifact", "SharedArtifactCache")
@@ -1,61 +1,219 @@
-from collections import defaultdict
+import hashlib
+import math
+import os
+import sys
+import threading
+import time
 from os.path import abspath, dirname, join
 from inspect import isclass
 
-import yaml
 from aiohttp import web
 from aiohttp.hdrs import METH_ANY, METH_ALL
-from jinja2 import Environment, BaseLoader
 
-try:
-    import ujson as json
-except ImportError: # pragma: no cover
-    import json
+from .cache import DocstringCache, swagger_file_cache
+from .serialization import (dumps_canonical, iter_document_json,
+                            iter_encoded, iter_swagger_json,
+                            join_swagger_json)
+from .tracing import RouteEvent, handler_name, traced_phase
+from .yaml_loader import load_yaml, yaml_error
 
 
 SWAGGER_TEMPLATE = abspath(join(dirname(__file__), "..", "templates"))
 
 
-def _extract_swagger_docs(end_point_doc, method="get"):
+# Below this number of YAML documents to parse, a process pool costs more
+# than it saves
+PARALLEL_PARSE_THRESHOLD = 1000
+
+SOURCE_DOCSTRING = "docstring"
+SOURCE_FILE = "file"
+
+_MISSING = object()
+
+# Bump when the generated definition changes for the same routes, so that
+# definitions shared by `fingerprint_routes` are built again
+FINGERPRINT_VERSION = b"1"
+
+
+def _invalid_swagger(description):
+    return {
+        "description": description,
+        "tags": ["Invalid Swagger"]
+    }
+
+
+def _extract_swagger_docs(end_point_doc):
     # Find Swagger start point in doc
     end_point_swagger_start = 0
     for i, doc_line in enumerate(end_point_doc):
         if "---" in doc_line:
             end_point_swagger_start = i + 1
             break
-
-    # Build JSON YAML Obj
-    try:
-        end_point_swagger_doc = (
-            yaml.full_load("\n".join(end_point_doc[end_point_swagger_start:]))
-        )
-    except yaml.YAMLError:
-        end_point_swagger_doc = {
-            "description": "⚠ Swagger document could not be loaded "
-                           "from docstring ⚠",
-            "tags": ["Invalid Swagger"]
-        }
-    return {method: end_point_swagger_doc}
+    return "\n".join(end_point_doc[end_point_swagger_start:])
 
 
-def _build_doc_from_func_doc(route):
+def _route_doc_sources(route):
+    """
+    Return the (method, source) pairs documenting `route`, where a source is
+    either (SOURCE_FILE, path) or (SOURCE_DOCSTRING, yaml_text)
+    """
+    # If route has a external link to doc, we use it, not function doc
+    if getattr(route.handler, "swagger_file", False):
+        return [(route.method.lower(),
+                 (SOURCE_FILE, route.handler.swagger_file))]
 
-    out = {}
+    out = []
     if isclass(route.handler) and issubclass(route.handler, web.View):
-        for method_name in _get_method_names_for_handler(route):
+        for method_name in sorted(_get_method_names_for_handler(route)):
             method = getattr(route.handler, method_name)
             if method.__doc__ is not None and "---" in method.__doc__:
                 end_point_doc = method.__doc__.splitlines()
-                out.update(_extract_swagger_docs(end_point_doc, method=method_name))
+                docs = _extract_swagger_docs(end_point_doc)
+                out.append((method_name, (SOURCE_DOCSTRING, docs)))
 
     else:
         try:
             end_point_doc = route.handler.__doc__.splitlines()
         except AttributeError:
-            return {}
-        out.update(_extract_swagger_docs(end_point_doc, method=str(route.method).lower()))
+            return []
+        out.append((str(route.method).lower(),
+                    (SOURCE_DOCSTRING, _extract_swagger_docs(end_point_doc))))
     return out
 
+
+def _parse_yaml_text(text):
+    start = time.perf_counter()
+    try:
+        doc = load_yaml(text)
+    except yaml_error():
+        return False, None, time.perf_counter() - start
+    return True, doc, time.perf_counter() - start
+
+
+def _parse_yaml_chunk(texts):
+    return [_parse_yaml_text(text) for text in texts]
+
+
+def _parse_yaml_texts(texts, workers=1,
+                      parallel_threshold=PARALLEL_PARSE_THRESHOLD):
+    """
+    Parse `texts`, in a process pool of `workers` processes if there are
+    enough of them (`workers=None` uses every CPU). Results are returned in
+    the same order as `texts`, as (ok, document, seconds) triples.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1 or len(texts) < parallel_threshold:
+        return _parse_yaml_chunk(texts)
+
+    chunk_size = max(1, math.ceil(len(texts) / (workers * 4)))
+    chunks = [texts[i:i + chunk_size]
+              for i in range(0, len(texts), chunk_size)]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    # With build="lazy" or "background", this runs in a thread of an event
+    # loop: fork would copy its locks in whatever state the other threads
+    # left them, so the workers are spawned
+    if sys.version_info >= (3, 7):
+        import multiprocessing
+        pool_options = {"mp_context": multiprocessing.get_context("spawn")}
+    elif threading.current_thread() is threading.main_thread():
+        pool_options = {}
+    else:
+        return _parse_yaml_chunk(texts)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, **pool_options) as pool:
+        # map() keeps the order of the chunks, so the merge is deterministic
+        for chunk_results in pool.map(_parse_yaml_chunk, chunks):
+            results.extend(chunk_results)
+    return results
+
+
+def _parse_doc_sources(sources, cache=None, workers=1,
+                       parallel_threshold=PARALLEL_PARSE_THRESHOLD,
+                       timings=None):
+    """
+    Map every source of `sources` to its Swagger document, or to an
+    "Invalid Swagger" placeholder when it can not be loaded.
+
+    When a `timings` dict is given, the first load of every source is
+    recorded in it as {source: (seconds, cached)}.
+    """
+    docs = {}
+    pending = {}
+
+    for source in sources:
+        kind, value = source
+
+        # Every reference goes through the file cache, which counts the
+        # reads it saves
+        if kind == SOURCE_FILE:
+            if timings is None:
+                docs[source] = _load_swagger_file(value, cache)
+                continue
+            start, reads = time.perf_counter(), swagger_file_cache.reads
+            docs[source] = _load_swagger_file(value, cache)
+            timings.setdefault(source, (time.perf_counter() - start,
+                                        swagger_file_cache.reads == reads))
+            continue
+
+        if source in docs or value in pending:
+            continue
+
+        key = None
+        if cache is not None:
+            start = time.perf_counter()
+            key = cache.text_key(value)
+            doc = cache.get(key, _MISSING)
+            if doc is not _MISSING:
+                docs[source] = doc
+                if timings is not None:
+                    timings[source] = (time.perf_counter() - start, True)
+                continue
+
+        pending[value] = (source, key)
+
+    texts = list(pending)
+    parsed = _parse_yaml_texts(texts, workers=workers,
+                               parallel_threshold=parallel_threshold)
+
+    for text, (ok, doc, duration) in zip(texts, parsed):
+        source, key = pending[text]
+        if timings is not None:
+            timings[source] = (duration, False)
+        if ok:
+            docs[source] = doc
+            if cache is not None:
+                cache.set(key, doc)
+        else:
+            docs[source] = _invalid_swagger(
+                "⚠ Swagger document could not be loaded from docstring ⚠")
+    return docs
+
+
+def _load_swagger_file(swagger_file, cache=None):
+    def _read():
+        with open(swagger_file, "r") as f:
+            return load_yaml(f.read())
+
+    def _parse():
+        if cache is None:
+            return _read()
+        return cache.load(cache.file_key(swagger_file), _read)
+
+    try:
+        return swagger_file_cache.load(swagger_file, _parse)
+    except yaml_error():
+        return _invalid_swagger(
+            "⚠ Swagger document could not be loaded from file ⚠")
+    except FileNotFoundError:
+        return _invalid_swagger(
+            "⚠ Swagger file not found ({}) ⚠".format(swagger_file))
+
+
 def _get_method_names_for_handler(route):
     # Return all valid method names in handler if the method is *,
     # otherwise return the specific method.
@@ -71,25 +229,256 @@ def _get_method_names_for_handler(route):
         }
 
 
-def generate_doc_from_each_end_point(
-        app: web.Application,
-        *,
+def _route_url(route):
+    url_info = route._resource.get_info()
+    if url_info.get("path", None):
+        return url_info.get("path")
+    return url_info.get("formatter")
+
+
+def _documented_routes(app, route_prefix: str = None):
+    """
+    The routes of `app` to document: not `swagger_ignore`d, and under
+    `route_prefix` (a whole path segment: "/v1" is not a prefix of "/v10")
+    """
+    routes = [route for route in app.router.routes()
+              if not getattr(route.handler, "swagger_ignore", False)]
+    if route_prefix is None:
+        return routes
+
+    route_prefix = route_prefix.rstrip("/")
+    return [route for route in routes
+            if _route_url(route) == route_prefix
+            or _route_url(route).startswith(route_prefix + "/")]
+
+
+class SwaggerIndex(object):
+    """
+    Swagger document built from the routes of an application, indexed by
+    route so that it can be updated when routes are added or removed.
+
+    Only the routes that changed since the last `refresh` are parsed, and
+    only the path items they belong to are serialized again.
+
+    With a `route_prefix`, only the routes under it are documented.
+
+    Without `keep_fragments`, the serialized path items are not kept: the
+    document is serialized from the parsed operations whenever it is
+    needed.
+    """
+
+    def __init__(self, app, base: dict, cache=None, parse_workers=1,
+                 parallel_threshold=PARALLEL_PARSE_THRESHOLD, trace=None,
+                 route_prefix: str = None, keep_fragments: bool = True):
+        self.app = app
+        self.route_prefix = route_prefix
+        self.keep_fragments = keep_fragments
+        self.base = base
+        self.cache = cache
+        self.parse_workers = parse_workers
+        self.parallel_threshold = parallel_threshold
+        self.trace = trace
+
+        # route -> (url, [(method, swagger_doc), ...])
+        self.routes = {}
+        # url -> serialized path item
+        self.path_fragments = {}
+
+        self.refresh()
+
+    def refresh(self) -> set:
+        """
+        Update the index with the current routes of the application.
+        Returns the set of URLs whose path item changed.
+        """
+        routes = _documented_routes(self.app, self.route_prefix)
+        known = set(routes)
+
+        added = [route for route in routes if route not in self.routes]
+        removed = [route for route in self.routes if route not in known]
+        if not added and not removed:
+            return set()
+
+        with traced_phase(self.trace, "collect_routes",
+                          routes=len(added)):
+            doc_sources = {route: _route_doc_sources(route)
+                           for route in added}
+
+        timings = None if self.trace is None else {}
+        with traced_phase(self.trace, "parse_docs") as details:
+            docs = _parse_doc_sources(
+                [source
+                 for sources in doc_sources.values()
+                 for _, source in sources],
+                cache=self.cache, workers=self.parse_workers,
+                parallel_threshold=self.parallel_threshold,
+                timings=timings)
+            details["sources"] = len(docs)
+
+        changed = set()
+        for route in added:
+            url = _route_url(route)
+            self.routes[route] = (url, [(method, docs[source])
+                                        for method, source
+                                        in doc_sources[route]])
+            changed.add(url)
+            if timings is not None:
+                self._trace_route(route, url, doc_sources[route], timings)
+
+        for route in removed:
+            changed.add(self.routes.pop(route)[0])
+
+        if self.keep_fragments:
+            self._serialize_paths(routes, changed)
+        if self.cache is not None:
+            self.cache.prune()
+        return changed
+
+    def _serialize_paths(self, routes, changed: set):
+        path_items = {url: None for url in changed}
+        for route in routes:
+            url, operations = self.routes[route]
+            if url in path_items and operations:
+                if path_items[url] is None:
+                    path_items[url] = {}
+                path_items[url].update(operations)
+
+        with traced_phase(self.trace, "serialize_paths",
+                          paths=len(path_items)):
+            for url, path_item in path_items.items():
+                if path_item is None:
+                    self.path_fragments.pop(url, None)
+                else:
+                    self.path_fragments[url] = dumps_canonical(path_item)
+
+    def _trace_route(self, route, url, sources, timings):
+        for method, source in sources:
+            kind, value = source
+            # Shared sources are only parsed for the first route using them
+            duration, cached = timings.pop(source, (0.0, True))
+            if kind == SOURCE_FILE:
+                try:
+                    size = os.path.getsize(value)
+                except OSError:
+                    size = 0
+            else:
+                size = len(value.encode("utf-8"))
+            self.trace(RouteEvent(
+                method=method, path=url,
+                handler=handler_name(route.handler,
+                                     method if isclass(route.handler)
+                                     else None),
+                source=kind, bytes=size, duration=duration, cached=cached))
+
+    def operations(self, route) -> dict:
+        """
+        The documented operations of `route`, as {method: swagger_doc}
+        """
+        return dict(self.routes.get(route, (None, ()))[1])
+
+    def dumps(self) -> str:
+        # Canonical key order: the same routes always give the same bytes
+        # (and therefore the same ETag) whichever process builds them
+        with traced_phase(self.trace, "serialize"):
+            if not self.keep_fragments:
+                return "".join(iter_document_json(self.document()))
+            return join_swagger_json(self.base, self.path_fragments)
+
+    def json_chunks(self):
+        """
+        Return a callable iterating over the encoded chunks of the current
+        document, the same bytes as `dumps`. Later refreshes of the index
+        do not change what it produces.
+
+        Without `keep_fragments`, each path item is serialized as it is
+        reached: only a few of them and a chunk are in memory at a time.
+        """
+        if not self.keep_fragments:
+            # Refreshes replace the operations of the routes, never modify
+            # them: the snapshot can share them
+            document = self.document()
+            return lambda: iter_encoded(iter_document_json(document))
+        base, path_fragments = self.base, dict(self.path_fragments)
+        return lambda: iter_encoded(iter_swagger_json(base, path_fragments))
+
+    def document(self) -> dict:
+        """
+        The current document as a dict, sharing the parsed operations
+        """
+        paths = {}
+        for url, operations in self.routes.values():
+            if operations:
+                paths.setdefault(url, {}).update(operations)
+        return dict(self.base, paths=paths)
+
+
+def _clean_description(description: str) -> str:
+    _start_desc = 0
+    for i, word in enumerate(description):
+        if word != '\n':
+            _start_desc = i
+            break
+    return "    ".join(description[_start_desc:].splitlines())
+
+
+def _native_base_swagger(
         ui_version: int = None,
         api_base_url: str = "/",
-        description: str = "Swagger API definition",
+        description: str = "",
         api_version: str = "1.0.0",
         title: str = "Swagger API",
         contact: str = "",
-        template_path: str = None,
         definitions: dict = None,
         security_definitions: dict = None):
-    # Clean description
-    _start_desc = 0
-    for i, word in enumerate(description):
-        if word != '\n':
-            _start_desc = i
-            break
-    cleaned_description = "    ".join(description[_start_desc:].splitlines())
+    """
+    The document of the default templates, built as a dict. The
+    `definitions` and `security_definitions` dicts are used as they are.
+    """
+    info = {"title": title, "version": str(api_version)}
+    if contact:
+        info["contact"] = {"name": contact}
+
+    if ui_version == 3:
+        info["description"] = description
+        components = {}
+        if definitions:
+            components["schemas"] = definitions
+        if security_definitions:
+            components["securitySchemes"] = security_definitions
+        return {
+            "openapi": "3.0.1",
+            "info": info,
+            "servers": [{"url": api_base_url}],
+            "components": components,
+        }
+
+    # A YAML block scalar in the template, hence the line break
+    info["description"] = description + "\n"
+    swagger = {
+        "swagger": "2.0",
+        "info": info,
+        "basePath": api_base_url,
+        "schemes": ["http", "https"],
+    }
+    if definitions:
+        swagger["definitions"] = definitions
+    if security_definitions:
+        swagger["securityDefinitions"] = security_definitions
+    return swagger
+
+
+def _render_base_template(
+        template_path: str,
+        api_base_url: str = "/",
+        description: str = "",
+        api_version: str = "1.0.0",
+        title: str = "Swagger API",
+        contact: str = "",
+        definitions: dict = None,
+        security_definitions: dict = None,
+        trace=None):
+    # Only custom templates need Jinja2
+    from jinja2 import Environment, BaseLoader
 
     def nesteddict2yaml(d, indent=10, result=""):
         for key, value in d.items():
@@ -106,16 +495,11 @@ def generate_doc_from_each_end_point(
     jinja2_env = Environment(loader=BaseLoader())
     jinja2_env.filters['nesteddict2yaml'] = nesteddict2yaml
 
-    if template_path is None:
-        if ui_version == 3:
-            template_path = join(SWAGGER_TEMPLATE, "openapi.yaml")
-        else:
-            template_path = join(SWAGGER_TEMPLATE, "swagger.yaml")
-
-    with open(template_path, "r") as f:
+    with traced_phase(trace, "render_template"), \
+            open(template_path, "r") as f:
         swagger_base = (
             jinja2_env.from_string(f.read()).render(
-                description=cleaned_description,
+                description=description,
                 version=api_version,
                 title=title,
                 contact=contact,
@@ -125,60 +509,144 @@ def generate_doc_from_each_end_point(
         )
 
     # The Swagger OBJ
-    swagger = yaml.full_load(swagger_base)
-    swagger["paths"] = defaultdict(dict)
-
-    for route in app.router.routes():
-
-        end_point_doc = None
-
-        # If route has a external link to doc, we use it, not function doc
-        if getattr(route.handler, "swagger_file", False):
-            try:
-                with open(route.handler.swagger_file, "r") as f:
-                    end_point_doc = {
-                        route.method.lower():
-                            yaml.full_load(f.read())
-                    }
-            except yaml.YAMLError:
-                end_point_doc = {
-                    route.method.lower(): {
-                        "description": "⚠ Swagger document could not be "
-                                       "loaded from file ⚠",
-                        "tags": ["Invalid Swagger"]
-                    }
-                }
-            except FileNotFoundError:
-                end_point_doc = {
-                    route.method.lower(): {
-                        "description":
-                            "⚠ Swagger file not "
-                            "found ({}) ⚠".format(route.handler.swagger_file),
-                        "tags": ["Invalid Swagger"]
-                    }
-                }
-
-        # Check if end-point has Swagger doc
-        else:
-            end_point_doc = _build_doc_from_func_doc(route)
+    with traced_phase(trace, "parse_template", bytes=len(swagger_base)):
+        swagger = load_yaml(swagger_base)
+    swagger.pop("paths", None)
+    return swagger
 
-        # there is doc available?
-        if end_point_doc:
-            url_info = route._resource.get_info()
-            if url_info.get("path", None):
-                url = url_info.get("path")
-            else:
-                url = url_info.get("formatter")
 
-            swagger["paths"][url].update(end_point_doc)
+def _build_base_swagger(
+        ui_version: int = None,
+        api_base_url: str = "/",
+        description: str = "Swagger API definition",
+        api_version: str = "1.0.0",
+        title: str = "Swagger API",
+        contact: str = "",
+        template_path: str = None,
+        definitions: dict = None,
+        security_definitions: dict = None,
+        trace=None):
+    cleaned_description = _clean_description(description)
+
+    if template_path is not None:
+        return _render_base_template(
+            template_path, api_base_url=api_base_url,
+            description=cleaned_description, api_version=api_version,
+            title=title, contact=contact, definitions=definitions,
+            security_definitions=security_definitions, trace=trace)
+
+    with traced_phase(trace, "base_document"):
+        return _native_base_swagger(
+            ui_version=ui_version, api_base_url=api_base_url,
+            description=cleaned_description, api_version=api_version,
+            title=title, contact=contact, definitions=definitions,
+            security_definitions=security_definitions)
+
+
+def build_swagger_index(
+        app: web.Application,
+        *,
+        ui_version: int = None,
+        api_base_url: str = "/",
+        description: str = "Swagger API definition",
+        api_version: str = "1.0.0",
+        title: str = "Swagger API",
+        contact: str = "",
+        template_path: str = None,
+        definitions: dict = None,
+        security_definitions: dict = None,
+        yaml_cache_dir: str = None,
+        parse_workers: int = 1,
+        parallel_threshold: int = PARALLEL_PARSE_THRESHOLD,
+        trace=None,
+        route_prefix: str = None,
+        keep_fragments: bool = True) -> SwaggerIndex:
+    cache = None
+    if yaml_cache_dir is not None:
+        cache = DocstringCache(yaml_cache_dir)
+
+    base = _build_base_swagger(
+        ui_version=ui_version, api_base_url=api_base_url,
+        description=description, api_version=api_version, title=title,
+        contact=contact, template_path=template_path,
+        definitions=definitions, security_definitions=security_definitions,
+        trace=trace)
 
-    return json.dumps(swagger)
+    return SwaggerIndex(app, base, cache=cache, parse_workers=parse_workers,
+                        parallel_threshold=parallel_threshold, trace=trace,
+                        route_prefix=route_prefix,
+                        keep_fragments=keep_fragments)
+
+
+def fingerprint_routes(app: web.Application, route_prefix: str = None,
+                       **options) -> str:
+    """
+    A hash of everything the definition of `app` is built from: the
+    documented routes, their docstrings (or the path, mtime and size of
+    their `swagger_path` files) and the build `options`. It is cheap: no
+    YAML is parsed. Two processes building the same application get the
+    same fingerprint.
+    """
+    digest = hashlib.sha256(FINGERPRINT_VERSION)
+    template_path = options.get("template_path")
+    if template_path is not None:
+        st = os.stat(template_path)
+        options["template_path"] = [abspath(template_path),
+                                    st.st_mtime_ns, st.st_size]
+    digest.update(dumps_canonical(options).encode("utf-8"))
+
+    for route in _documented_routes(app, route_prefix):
+        for method, (kind, value) in _route_doc_sources(route):
+            if kind == SOURCE_FILE:
+                try:
+                    st = os.stat(value)
+                except OSError:
+                    # Documented as missing until the file shows up
+                    st = None
+                value = "{}\0{}\0{}".format(
+                    abspath(value), getattr(st, "st_mtime_ns", None),
+                    getattr(st, "st_size", None))
+            digest.update("\0{}\0{}\0{}\0{}\0".format(
+                _route_url(route), method, kind, value).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def generate_doc_from_each_end_point(
+        app: web.Application,
+        *,
+        ui_version: int = None,
+        api_base_url: str = "/",
+        description: str = "Swagger API definition",
+        api_version: str = "1.0.0",
+        title: str = "Swagger API",
+        contact: str = "",
+        template_path: str = None,
+        definitions: dict = None,
+        security_definitions: dict = None,
+        yaml_cache_dir: str = None,
+        parse_workers: int = 1,
+        parallel_threshold: int = PARALLEL_PARSE_THRESHOLD,
+        trace=None,
+        route_prefix: str = None):
+    return build_swagger_index(
+        app, ui_version=ui_version, api_base_url=api_base_url,
+        description=description, api_version=api_version, title=title,
+        contact=contact, template_path=template_path,
+        definitions=definitions, security_definitions=security_definitions,
+        yaml_cache_dir=yaml_cache_dir, parse_workers=parse_workers,
+        parallel_threshold=parallel_threshold, trace=trace,
+        route_prefix=route_prefix
+    ).dumps()
 
 
 def load_doc_from_yaml_file(doc_path: str):
-    with open(doc_path, "r") as f:
-        loaded_yaml = yaml.full_load(f.read())
-        return json.dumps(loaded_yaml)
+    def _read():
+        with open(doc_path, "r") as f:
+            return load_yaml(f.read())
+
+    return dumps_canonical(swagger_file_cache.load(doc_path, _read))
 
 
-__all__ = ("generate_doc_from_each_end_point", "load_doc_from_yaml_file")
+__all__ = ("build_swagger_index", "fingerprint_routes",
+           "generate_doc_from_each_end_point",
+           "load_doc_from_yaml_file")
@@ -0,0 +1,194 @@
+import copy
+import hashlib
+import os
+import stat
+import threading
+from os.path import join
+
+
+# Bump when the parsed representation changes, to ignore older entries
+CACHE_FORMAT_VERSION = b"2"
+
+DEFAULT_CACHE_MAX_SIZE = 64 * 1024 * 1024
+
+_MISSING = object()
+
+
+def _check_private(directory: str):
+    if not hasattr(os, "getuid"):  # pragma: no cover
+        # No POSIX ownership to check (Windows)
+        return
+    st = os.stat(directory)
+    if st.st_uid != os.getuid() or \
+            st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise ValueError(
+            "{} must belong to the current user and be writable by nobody "
+            "else: its entries are unpickled".format(directory))
+
+
+class DocstringCache(object):
+    """
+    Persistent cache of parsed Swagger YAML fragments.
+
+    Entries are pickles stored under `directory`, one file per fragment,
+    named after a hash of the fragment text (or of the path, mtime and size
+    of a `swagger_path` file). Files are written atomically, so several
+    processes can share the same directory; unreadable entries count as
+    misses. `prune` keeps the directory under `max_size` bytes, evicting the
+    least recently used entries first.
+
+    Unpickling runs code: the directory is created private (0700), and an
+    existing one is refused when another user owns it or can write to it.
+    """
+
+    def __init__(self, directory: str, max_size: int = DEFAULT_CACHE_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        _check_private(directory)
+
+    @staticmethod
+    def text_key(text: str) -> str:
+        return hashlib.sha256(
+            CACHE_FORMAT_VERSION + b"text\0" + text.encode("utf-8")
+        ).hexdigest()
+
+    @staticmethod
+    def file_key(path: str) -> str:
+        st = os.stat(path)
+        return hashlib.sha256(
+            CACHE_FORMAT_VERSION + "file\0{}\0{}\0{}".format(
+                os.path.abspath(path), st.st_mtime_ns, st.st_size
+            ).encode("utf-8")
+        ).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return join(self.directory, key[:2], key + ".pickle")
+
+    def get(self, key: str, default=None):
+        import pickle
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except Exception:
+            self.misses += 1
+            return default
+
+        try:
+            # Refresh the entry for the LRU eviction
+            os.utime(path)
+        except OSError:  # pragma: no cover
+            pass
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value):
+        import pickle
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        tmp_path = "{}.{}.{}.tmp".format(path, os.getpid(),
+                                         threading.get_ident())
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            # A read-only or full cache directory must not break the build
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def load(self, key: str, parse):
+        """
+        Return the cached value for `key`, computing and storing it with
+        `parse()` on a miss
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = parse()
+            self.set(key, value)
+        return value
+
+    def prune(self) -> int:
+        """
+        Evict least recently used entries until the cache fits in
+        `max_size`. Returns the number of removed entries.
+        """
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+class SwaggerFileCache(object):
+    """
+    In-memory cache of parsed Swagger YAML files, keyed by path and
+    invalidated when the modification time or the size of a file changes.
+
+    A file is parsed once, but every caller gets its own copy of the
+    document (copy-on-write at the granularity of a call): modifying it
+    never changes the cached one, nor the documents of other callers.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.reads_saved = 0
+
+    def load(self, path: str, parse):
+        """
+        Return a copy of the parsed document of `path`, calling `parse()` to
+        read it when it is not cached or the file changed
+        """
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                self.reads_saved += 1
+                return copy.deepcopy(entry[1])
+
+        doc = parse()
+        with self._lock:
+            self.reads += 1
+            self._entries[path] = (stamp, doc)
+        return copy.deepcopy(doc)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by every build of the process
+swagger_file_cache = SwaggerFileCache()
+
+
+__all__ = ("DocstringCache", "SwaggerFileCache", "swagger_file_cache")
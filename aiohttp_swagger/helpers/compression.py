@@ -0,0 +1,210 @@
+import os
+from os.path import join, splitext
+
+
+# Content codings we know how to precompress, in server preference order
+ENCODINGS = ("br", "gzip")
+
+ENCODING_EXTENSIONS = {
+    "br": ".br",
+    "gzip": ".gz",
+}
+
+COMPRESSIBLE_EXTENSIONS = (
+    ".css", ".html", ".js", ".json", ".map", ".svg", ".ttf", ".txt",
+    ".yaml"
+)
+
+
+def _import_brotli():
+    # Only needed to compress, not to serve precompressed files
+    try:
+        import brotli
+    except ImportError:  # pragma: no cover
+        return None
+    return brotli
+
+
+def available_encodings():
+    """
+    Return the content codings that can be produced in this environment
+    """
+    if _import_brotli() is None:
+        return tuple(e for e in ENCODINGS if e != "br")
+    return ENCODINGS
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """
+    Compress `data` with the highest level of the given content coding
+    """
+    if encoding == "gzip":
+        import gzip
+
+        # mtime=0 keeps the output reproducible between builds
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == "br":
+        brotli = _import_brotli()
+        if brotli is None:
+            raise RuntimeError("brotli is not installed")
+        return brotli.compress(data, quality=11)
+    raise ValueError("Unknown content coding: {}".format(encoding))
+
+
+class _BrotliCompressor(object):
+    def __init__(self, brotli):
+        self._compressor = brotli.Compressor(quality=11)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+def compressor(encoding: str):
+    """
+    Return an incremental compressor (`compress(data)`, then `flush()`) for
+    the given content coding, at its highest level
+    """
+    if encoding == "gzip":
+        import zlib
+
+        # A gzip header with mtime=0, as `compress`
+        return zlib.compressobj(9, zlib.DEFLATED, 31)
+    if encoding == "br":
+        brotli = _import_brotli()
+        if brotli is None:
+            raise RuntimeError("brotli is not installed")
+        return _BrotliCompressor(brotli)
+    raise ValueError("Unknown content coding: {}".format(encoding))
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        import gzip
+
+        return gzip.decompress(data)
+    if encoding == "br":
+        brotli = _import_brotli()
+        if brotli is None:
+            raise RuntimeError("brotli is not installed")
+        return brotli.decompress(data)
+    raise ValueError("Unknown content coding: {}".format(encoding))
+
+
+def _parse_accept_encoding(accept_encoding: str):
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding] = q
+    return qualities
+
+
+def select_encoding(accept_encoding: str, available) -> str:
+    """
+    Pick the best content coding from `available` for an Accept-Encoding
+    header value. Returns None when the identity body must be sent.
+
+    Ties in client preference are broken using `ENCODINGS` order.
+    """
+    if not accept_encoding or not available:
+        return None
+
+    qualities = _parse_accept_encoding(accept_encoding)
+    wildcard = qualities.get("*", 0.0)
+
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        if encoding not in available:
+            continue
+        q = qualities.get(encoding, wildcard)
+        if encoding == "gzip":
+            q = qualities.get("x-gzip", q)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def compress_static_files(directory: str, encodings=None) -> int:
+    """
+    Write precompressed siblings (`name.gz`, `name.br`) for every
+    compressible file under `directory`.
+
+    Siblings that are up to date are left alone, and variants that would not
+    be smaller than the original are not written. Returns the number of files
+    written.
+    """
+    if encodings is None:
+        encodings = available_encodings()
+
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if splitext(name)[1] not in COMPRESSIBLE_EXTENSIONS:
+                continue
+
+            path = join(root, name)
+            mtime = os.stat(path).st_mtime
+            data = None
+
+            for encoding in encodings:
+                target = path + ENCODING_EXTENSIONS[encoding]
+                if os.path.exists(target) and \
+                        os.stat(target).st_mtime >= mtime:
+                    continue
+
+                if data is None:
+                    with open(path, "rb") as f:
+                        data = f.read()
+
+                compressed = compress(data, encoding)
+                if len(compressed) >= len(data):
+                    continue
+
+                _write_atomic(target, compressed)
+                written += 1
+    return written
+
+
+def find_static_files(directory: str) -> dict:
+    """
+    Map every servable file under `directory` (relative, '/' separated) to
+    the precompressed encodings available on disk for it.
+    """
+    suffixes = {ext: enc for enc, ext in ENCODING_EXTENSIONS.items()}
+
+    files = {}
+    for root, _, names in os.walk(directory):
+        names = set(names)
+        for name in names:
+            if splitext(name)[1] in suffixes:
+                continue
+
+            rel_path = os.path.relpath(join(root, name), directory)
+            files[rel_path.replace(os.sep, "/")] = tuple(
+                encoding for encoding in ENCODINGS
+                if name + ENCODING_EXTENSIONS[encoding] in names
+            )
+    return files
+
+
+__all__ = ("compress_static_files", "select_encoding")
@@ -0,0 +1,213 @@
+import asyncio
+import threading
+
+from .responses import FileBody, PreparedBody, StreamedBody, precompress
+from .shards import TagShards
+from .tracing import traced_phase
+from .validation import RequestValidators
+
+
+BUILD_MODES = ("eager", "lazy", "background")
+
+
+class SwaggerDefinition(object):
+    """
+    The Swagger JSON definition served by `setup_swagger`.
+
+    `build` is a callable returning the definition as a JSON str, as an
+    encoded PreparedBody (loaded from a shared artifact), or as the
+    SwaggerIndex of the routes it documents. It runs either right away
+    (`build_now`) or in the default executor the first time it is needed
+    (`start` / `get`). Concurrent callers of `get` share a single build.
+
+    With a `shard_url` (the URL pattern of a tag shard, `{}` standing for
+    the tag), the per-tag documents are prepared along with the definition.
+
+    With `stream`, a definition built from the routes is written path item
+    by path item on every request (`StreamedBody`) rather than kept as a
+    single `bytes`. Build it from an index without `keep_fragments`, so
+    that it is serialized from the parsed operations as it is sent.
+
+    With a `sendfile_path`, the definition (and its encoded variants) is
+    written to this file and sent from there (`FileBody`). Unless `validate`
+    needs them, the index and its parsed operations are not kept either:
+    `refresh` builds the definition again. Build it from an index without
+    `keep_fragments`, so that nothing serialized is kept while it is
+    written.
+
+    With `encodings`, variants of the definition compressed with these
+    content codings are prepared in a thread once it is published, and
+    replace it when they are ready (`compression` is the future of that
+    work). With `compressed_only`, only the compressed variants are then
+    kept in memory (`CompressedBody`).
+
+    With `validate`, the request validators of the operations are compiled
+    along with a definition built from the routes.
+
+    `trace` receives the timing events of the builds (see `tracing`).
+    """
+
+    def __init__(self, build, cache_control: str = "no-cache",
+                 shard_url: str = None, stream: bool = False, trace=None,
+                 validate: bool = False, sendfile_path: str = None,
+                 encodings=(), compressed_only: bool = False):
+        self._build = build
+        self._cache_control = cache_control
+        self._shard_url = shard_url
+        self._stream = stream
+        self._trace = trace
+        self._sendfile_path = sendfile_path
+        self._encodings = tuple(encodings)
+        self._compressed_only = compressed_only
+        self._compress_executor = None
+        self._lock = threading.Lock()
+        # Future of the compression of the last published body
+        self.compression = None
+        self.validate = validate
+        self.validators = None
+        self._future = None
+        self.content = None
+        self.body = None
+        self.shards = None
+        # SwaggerIndex of the definition, when built from the routes
+        self.index = None
+        # Built from the routes, without keeping the index (sendfile)
+        self._rebuild_on_refresh = False
+        # ETag of the last published definition, before compression
+        self._etag = None
+
+    def _publish(self, content):
+        if isinstance(content, str):
+            self.content = content
+            return self.set_body(PreparedBody.from_text(
+                content, "application/json",
+                cache_control=self._cache_control))
+        if isinstance(content, PreparedBody):
+            self.content = content.body.decode("utf-8")
+            return self.set_body(content)
+
+        self.index = content
+        if self.validate:
+            with traced_phase(self._trace, "compile_validators"):
+                validators = self.validators or RequestValidators()
+                validators.update(content)
+            self.validators = validators
+
+        if self._stream or self._sendfile_path is not None:
+            # Written to the file chunk by chunk, without the whole string
+            self.content = None
+            with traced_phase(self._trace, "serialize"):
+                body = StreamedBody(content.json_chunks(),
+                                    "application/json; charset=utf-8",
+                                    cache_control=self._cache_control)
+        else:
+            self.content = content.dumps()
+            body = PreparedBody.from_text(self.content, "application/json",
+                                          cache_control=self._cache_control)
+        # The parsed operations are at hand: no need to parse the JSON again
+        body = self.set_body(body, document=content.document())
+        if self._sendfile_path is not None and not self.validate:
+            # Everything is in the file now
+            self.index = None
+            self._rebuild_on_refresh = True
+        return body
+
+    def set_body(self, body, document: dict = None):
+        """
+        Publish an already encoded definition. `document` is its parsed
+        form, when available.
+        """
+        if self._shard_url is not None:
+            with traced_phase(self._trace, "tag_shards"):
+                self.shards = TagShards(body.body if document is None
+                                        else document, self._shard_url,
+                                        cache_control=self._cache_control)
+        if self._sendfile_path is not None:
+            self.content = None
+            with traced_phase(self._trace, "write_file"):
+                body = FileBody.write(self._sendfile_path, body)
+        if self._compressed_only:
+            self.content = None
+        with self._lock:
+            self._etag = body.etag
+            self.body = body
+            if self._encodings and not isinstance(body, StreamedBody):
+                self.compression = self._start_compression(body)
+        return body
+
+    def _start_compression(self, body):
+        if self._compress_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._compress_executor = ThreadPoolExecutor(1)
+        return self._compress_executor.submit(self._compress, body)
+
+    def _compress(self, body):
+        if self.body is not body:
+            # Replaced before its turn came
+            return None
+        with traced_phase(self._trace, "compress",
+                          encodings=self._encodings):
+            compressed = precompress(body, self._encodings,
+                                     identity=not self._compressed_only)
+        with self._lock:
+            if self.body is not body:
+                return None
+            self.body = compressed
+        return compressed
+
+    def build_now(self):
+        with traced_phase(self._trace, "build"):
+            return self._publish(self._build())
+
+    def refresh(self) -> bool:
+        """
+        Bring an already built definition up to date with the routes of the
+        application. The new body (and its ETag) replaces the old one in a
+        single step. Returns whether the definition changed. Without its
+        index (`sendfile_path`), the definition is built again.
+        """
+        if self.body is None:
+            return False
+        if self.index is None:
+            if not self._rebuild_on_refresh:
+                return False
+            with traced_phase(self._trace, "refresh") as details:
+                etag = self._etag
+                self._publish(self._build())
+                details["rebuilt"] = True
+            return self._etag != etag
+
+        with traced_phase(self._trace, "refresh") as details:
+            changed = self.index.refresh()
+            details["paths"] = len(changed)
+            if changed:
+                self._publish(self.index)
+        return bool(changed)
+
+    def start(self, loop=None):
+        """
+        Schedule the build in the default executor, unless it is already
+        built or being built. Returns the future of the build.
+        """
+        if self._future is None:
+            if loop is None:
+                loop = asyncio.get_event_loop()
+            self._future = loop.run_in_executor(None, self.build_now)
+            self._future.add_done_callback(self._build_done)
+        return self._future
+
+    def _build_done(self, future):
+        # Let the next caller retry after a failed build
+        if future.cancelled() or future.exception() is not None:
+            self._future = None
+
+    async def get(self):
+        if self.body is not None:
+            return self.body
+        # A cancelled request must not cancel the build other requests wait on
+        return await asyncio.shield(self.start())
+
+    async def get_shards(self) -> TagShards:
+        await self.get()
+        return self.shards
@@ -0,0 +1,141 @@
+import mimetypes
+import os
+from os.path import join, splitext
+
+from aiohttp import hdrs
+
+from .compression import ENCODING_EXTENSIONS, find_static_files
+from .responses import PreparedBody
+from .static import IMMUTABLE_CACHE_CONTROL, fingerprint_static_references
+from .tracing import traced_phase
+
+
+# Source maps are only useful to debug Swagger UI itself
+DEFAULT_IN_MEMORY_EXCLUDE = (".map",)
+
+
+class SwaggerStatic(object):
+    """
+    A Swagger UI asset tree (`swagger_ui` or `swagger_ui3`), mounted once
+    per application under `url`, however many `setup_swagger` mounts use
+    it. Its precompressed siblings are looked up once.
+
+    Once `load`ed, the assets are served from memory, for every mount using
+    the tree: `bodies` maps every asset name (and content-hashed name) to
+    its PreparedBody, and `memory` is the number of bytes they hold. The
+    excluded assets are still served, from disk. Its route answers within
+    the limits of `admission`: the one of the first mount that sets it.
+    """
+
+    def __init__(self, path: str, url: str):
+        self.path = path
+        self.url = url
+        self.files = find_static_files(path)
+        # Content-hashed name -> file name
+        self.fingerprints = {}
+        self.bodies = None
+        self.memory = 0
+        self.admission = None
+        self._template = None
+        self._fingerprinted_template = None
+
+    def load(self, exclude=DEFAULT_IN_MEMORY_EXCLUDE, trace=None):
+        """
+        Read the assets and their precompressed siblings into memory, except
+        the files whose extension is in `exclude`
+        """
+        if self.bodies is not None:
+            return
+        with traced_phase(trace, "load_static") as details:
+            bodies = {}
+            for name, encodings in self.files.items():
+                if splitext(name)[1] not in exclude:
+                    bodies[name] = self._read(name, encodings)
+            self.memory = sum(
+                len(body.body) + sum(len(variant.body)
+                                     for variant in body.variants.values())
+                for body in bodies.values())
+            details["files"] = len(bodies)
+            details["bytes"] = self.memory
+        self.bodies = bodies
+        self._add_fingerprinted(self.fingerprints)
+
+    def _read(self, name: str, encodings) -> PreparedBody:
+        path = join(self.path, name)
+        with open(path, "rb") as f:
+            body = PreparedBody(
+                f.read(),
+                mimetypes.guess_type(name)[0] or "application/octet-stream",
+                cache_control=None,
+                last_modified=int(os.fstat(f.fileno()).st_mtime))
+        for encoding in encodings:
+            with open(path + ENCODING_EXTENSIONS[encoding], "rb") as f:
+                body.add_encoding(encoding, f.read())
+        return body
+
+    def _add_fingerprinted(self, fingerprints: dict):
+        if self.bodies is None:
+            return
+        for hashed_name, name in fingerprints.items():
+            body = self.bodies.get(name)
+            if body is None:
+                continue
+            # The same bytes, cached for good under their hashed name
+            immutable = PreparedBody(
+                body.body, body.headers[hdrs.CONTENT_TYPE],
+                cache_control=IMMUTABLE_CACHE_CONTROL,
+                last_modified=body.last_modified, etag=body.etag)
+            for encoding, variant in body.variants.items():
+                immutable.add_encoding(encoding, variant.body)
+            self.bodies[hashed_name] = immutable
+
+    def template(self, fingerprint: bool = False) -> str:
+        """
+        The index.html of the tree, with content-hashed asset references
+        when `fingerprint` is set
+        """
+        if self._template is None:
+            with open(join(self.path, "index.html"), "r") as f:
+                self._template = f.read()
+        if not fingerprint:
+            return self._template
+
+        if self._fingerprinted_template is None:
+            self._fingerprinted_template, fingerprints = \
+                fingerprint_static_references(self._template, self.path,
+                                              self.files)
+            self.fingerprints.update(fingerprints)
+            self._add_fingerprinted(fingerprints)
+        return self._fingerprinted_template
+
+
+class SwaggerMount(object):
+    """
+    The documentation served by one `setup_swagger` call, under
+    `swagger_url`: its definition, its Swagger UI page and the asset tree
+    the page uses. Its routes answer within the limits of `admission`, when
+    set.
+    """
+
+    def __init__(self, swagger_url: str, definition, static: SwaggerStatic,
+                 build: str = "eager", refresh_on_startup: bool = False,
+                 admission=None):
+        self.swagger_url = swagger_url
+        self.definition = definition
+        self.static = static
+        self.build = build
+        self.refresh_on_startup = refresh_on_startup
+        self.admission = admission
+        self.template_content = None
+        self.template_body = None
+
+
+def swagger_mounts(app) -> dict:
+    """
+    The documentation mounted on `app`, as {swagger_url: SwaggerMount},
+    without the trailing slash of the URLs
+    """
+    return app.get("SWAGGER_MOUNTS", {})
+
+
+__all__ = ("SwaggerMount", "SwaggerStatic", "swagger_mounts")
@@ -0,0 +1,376 @@
+import hashlib
+import os
+import time
+from email.utils import formatdate
+
+from aiohttp import hdrs, web
+
+from .compression import (compress, compressor, decompress,
+                          select_encoding)
+from .serialization import CHUNK_SIZE
+
+
+def compute_etag(body: bytes) -> str:
+    """
+    Return a strong ETag for `body`. It only depends on the content, so every
+    process serving the same bytes produces the same value.
+    """
+    return '"{}"'.format(hashlib.sha256(body).hexdigest()[:32])
+
+
+def format_http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Weak comparison of `etag` against an If-None-Match header value
+    """
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def is_not_modified(request, etag: str, last_modified: float) -> bool:
+    """
+    Evaluate the conditional GET/HEAD headers of `request`. If-None-Match
+    takes precedence over If-Modified-Since (RFC 7232, section 6).
+    """
+    if request.method not in ("GET", "HEAD"):
+        return False
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = request.if_modified_since
+    if if_modified_since is not None and last_modified is not None:
+        return int(last_modified) <= if_modified_since.timestamp()
+
+    return False
+
+
+class PreparedBody(object):
+    """
+    A response body encoded once, together with the headers sent with it.
+
+    Precompressed variants of the body can be attached with `add_encoding`;
+    `prepared_response` picks one according to the Accept-Encoding header.
+    """
+    __slots__ = ("body", "etag", "last_modified", "headers",
+                 "validator_headers", "variants")
+
+    def __init__(self, body: bytes, content_type: str,
+                 cache_control: str = "no-cache", last_modified: int = None,
+                 etag: str = None):
+        self.body = body
+        self.etag = compute_etag(body) if etag is None else etag
+        self.last_modified = (int(time.time()) if last_modified is None
+                              else last_modified)
+        self.variants = {}
+
+        self.validator_headers = {
+            hdrs.ETAG: self.etag,
+            hdrs.LAST_MODIFIED: format_http_date(self.last_modified),
+        }
+        # None leaves the freshness to the client, like a static file
+        if cache_control is not None:
+            self.validator_headers[hdrs.CACHE_CONTROL] = cache_control
+        self.headers = dict(self.validator_headers)
+        self.headers[hdrs.CONTENT_TYPE] = content_type
+        self.headers[hdrs.CONTENT_LENGTH] = str(len(body))
+
+    @classmethod
+    def from_text(cls, text: str, content_type: str, **kwargs):
+        return cls(text.encode("utf-8"),
+                   "{}; charset=utf-8".format(content_type), **kwargs)
+
+    def add_encoding(self, encoding: str, body: bytes):
+        """
+        Attach the `encoding` (gzip, br) compressed form of the body
+        """
+        # Each representation needs its own strong ETag
+        variant = PreparedBody(
+            body, self.headers[hdrs.CONTENT_TYPE],
+            cache_control=self.headers.get(hdrs.CACHE_CONTROL),
+            last_modified=self.last_modified,
+            etag='{}-{}"'.format(self.etag[:-1], encoding))
+        variant.headers[hdrs.CONTENT_ENCODING] = encoding
+        self.variants[encoding] = variant
+
+        for prepared in [self] + list(self.variants.values()):
+            prepared.headers[hdrs.VARY] = hdrs.ACCEPT_ENCODING
+            prepared.validator_headers[hdrs.VARY] = hdrs.ACCEPT_ENCODING
+
+    def negotiate(self, request) -> "PreparedBody":
+        if not self.variants:
+            return self
+        encoding = select_encoding(
+            request.headers.get(hdrs.ACCEPT_ENCODING, ""), self.variants)
+        return self if encoding is None else self.variants[encoding]
+
+
+class CompressedBody(object):
+    """
+    A PreparedBody keeping only its encoded variants in memory. The body is
+    decompressed on demand, for the rare clients accepting none of them.
+    """
+    __slots__ = ("etag", "last_modified", "headers", "validator_headers",
+                 "variants")
+
+    def __init__(self, prepared: PreparedBody):
+        if not prepared.variants:
+            raise ValueError("A compressed body needs encoded variants")
+        self.etag = prepared.etag
+        self.last_modified = prepared.last_modified
+        self.headers = prepared.headers
+        self.validator_headers = prepared.validator_headers
+        self.variants = prepared.variants
+
+    @property
+    def body(self) -> bytes:
+        encoding, variant = next(iter(self.variants.items()))
+        return decompress(variant.body, encoding)
+
+    def negotiate(self, request) -> PreparedBody:
+        encoding = select_encoding(
+            request.headers.get(hdrs.ACCEPT_ENCODING, ""), self.variants)
+        if encoding is not None:
+            return self.variants[encoding]
+        identity = PreparedBody(
+            self.body, self.headers[hdrs.CONTENT_TYPE],
+            cache_control=self.headers.get(hdrs.CACHE_CONTROL),
+            last_modified=self.last_modified, etag=self.etag)
+        identity.headers = self.headers
+        identity.validator_headers = self.validator_headers
+        return identity
+
+
+class StreamedBody(object):
+    """
+    A response body produced chunk by chunk every time it is sent, instead
+    of being kept in memory as a single `bytes`.
+
+    `chunks` is a callable returning a new iterator over the (bytes) chunks
+    of the body; it must produce the same bytes on every call. They are
+    read once here to compute the ETag and the Content-Length.
+    """
+    __slots__ = ("chunks", "etag", "last_modified", "headers",
+                 "validator_headers")
+
+    def __init__(self, chunks, content_type: str,
+                 cache_control: str = "no-cache", last_modified: int = None):
+        digest = hashlib.sha256()
+        length = 0
+        for chunk in chunks():
+            digest.update(chunk)
+            length += len(chunk)
+
+        self.chunks = chunks
+        self.etag = '"{}"'.format(digest.hexdigest()[:32])
+        self.last_modified = (int(time.time()) if last_modified is None
+                              else last_modified)
+
+        self.validator_headers = {
+            hdrs.ETAG: self.etag,
+            hdrs.LAST_MODIFIED: format_http_date(self.last_modified),
+            hdrs.CACHE_CONTROL: cache_control,
+        }
+        self.headers = dict(self.validator_headers)
+        self.headers[hdrs.CONTENT_TYPE] = content_type
+        self.headers[hdrs.CONTENT_LENGTH] = str(length)
+
+    async def write_to(self, response: web.StreamResponse):
+        for chunk in self.chunks():
+            await response.write(chunk)
+
+
+async def streamed_response(request, streamed: StreamedBody):
+    """
+    Answer `request` with a streamed body, or with 304 when the client copy
+    is still valid
+    """
+    if is_not_modified(request, streamed.etag, streamed.last_modified):
+        return web.Response(status=304, headers=streamed.validator_headers)
+
+    response = web.StreamResponse(headers=streamed.headers)
+    await response.prepare(request)
+    if request.method != hdrs.METH_HEAD:
+        await streamed.write_to(response)
+    await response.write_eof()
+    return response
+
+
+class FileBody(object):
+    """
+    A response body written to a file, sent by the kernel (sendfile) rather
+    than copied through the process.
+
+    It keeps the ETag and headers of the body it was written from, and its
+    encoded variants are written next to it, as `path.<encoding>` (not
+    `.gz`: FileResponse would pick a `.gz` sibling on its own).
+    """
+    __slots__ = ("path", "etag", "last_modified", "headers",
+                 "validator_headers", "variants")
+
+    def __init__(self, path: str, body):
+        self.path = path
+        self.etag = body.etag
+        self.last_modified = body.last_modified
+        self.validator_headers = dict(body.validator_headers)
+        # FileResponse sends the length of the file (or of the range)
+        self.headers = {name: value for name, value in body.headers.items()
+                        if name != hdrs.CONTENT_LENGTH}
+        self.variants = {}
+
+    @classmethod
+    def write(cls, path: str, body) -> "FileBody":
+        """
+        Write a PreparedBody (with its encoded variants) or a StreamedBody to
+        `path`. Files are replaced atomically, so that several processes can
+        use the same path.
+        """
+        chunks = body.chunks if isinstance(body, StreamedBody) else (
+            lambda: (body.body,))
+        _write_chunks(path, chunks(), body.last_modified)
+        file_body = cls(path, body)
+
+        for encoding, variant in getattr(body, "variants", {}).items():
+            variant_path = "{}.{}".format(path, encoding)
+            _write_chunks(variant_path, (variant.body,), body.last_modified)
+            file_body.add_encoding(encoding, variant_path)
+        return file_body
+
+    def add_encoding(self, encoding: str, path: str):
+        """
+        Attach the file holding the `encoding` compressed form of the body
+        """
+        variant = FileBody(path, self)
+        variant.etag = '{}-{}"'.format(self.etag[:-1], encoding)
+        variant.validator_headers[hdrs.ETAG] = variant.etag
+        variant.headers[hdrs.ETAG] = variant.etag
+        variant.headers[hdrs.CONTENT_ENCODING] = encoding
+        self.variants[encoding] = variant
+
+        for file_body in [self] + list(self.variants.values()):
+            file_body.headers[hdrs.VARY] = hdrs.ACCEPT_ENCODING
+            file_body.validator_headers[hdrs.VARY] = hdrs.ACCEPT_ENCODING
+
+    def negotiate(self, request) -> "FileBody":
+        if not self.variants:
+            return self
+        encoding = select_encoding(
+            request.headers.get(hdrs.ACCEPT_ENCODING, ""), self.variants)
+        return self if encoding is None else self.variants[encoding]
+
+
+def precompress(body, encodings, identity: bool = True):
+    """
+    Return a copy of a PreparedBody or FileBody with variants compressed
+    with `encodings` (at their highest levels), besides the ones it already
+    has. Without `identity`, a PreparedBody only keeps its compressed forms
+    in memory (CompressedBody).
+    """
+    encodings = [encoding for encoding in encodings
+                 if encoding not in body.variants]
+
+    if isinstance(body, FileBody):
+        compressed = FileBody(body.path, body)
+        compressed.variants.update(body.variants)
+        for encoding in encodings:
+            variant_path = "{}.{}".format(body.path, encoding)
+            with open(body.path, "rb") as f:
+                _write_chunks(variant_path, _compressed_chunks(f, encoding),
+                              body.last_modified)
+            compressed.add_encoding(encoding, variant_path)
+        return compressed
+
+    compressed = PreparedBody(
+        body.body, body.headers[hdrs.CONTENT_TYPE],
+        cache_control=body.headers.get(hdrs.CACHE_CONTROL),
+        last_modified=body.last_modified, etag=body.etag)
+    for encoding, variant in body.variants.items():
+        compressed.add_encoding(encoding, variant.body)
+    for encoding in encodings:
+        compressed.add_encoding(encoding, compress(body.body, encoding))
+    return compressed if identity else CompressedBody(compressed)
+
+
+def _compressed_chunks(f, encoding: str):
+    compressing = compressor(encoding)
+    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+        yield compressing.compress(chunk)
+    yield compressing.flush()
+
+
+def _write_chunks(path: str, chunks, last_modified: int):
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    # FileResponse sends the mtime as Last-Modified
+    os.utime(tmp_path, (last_modified, last_modified))
+    os.replace(tmp_path, path)
+
+
+class IdempotentFileResponse(web.FileResponse):
+    """
+    A FileResponse the handler can send itself (see AdmissionControl):
+    preparing it again, as aiohttp does once the handler returns, does
+    nothing
+    """
+
+    _sent = False
+
+    async def prepare(self, request):
+        # Not `prepared`: it is reset once the body is sent
+        if self._sent:
+            return None
+        self._sent = True
+        return await super().prepare(request)
+
+
+class _FileBodyResponse(IdempotentFileResponse):
+    """
+    A FileResponse sending the ETag of a FileBody instead of one made of
+    the mtime and size of the file
+    """
+
+    def __init__(self, file_body: FileBody):
+        # The ETag header of the FileBody is sent as it is by aiohttp < 3.8
+        super().__init__(file_body.path, headers=file_body.headers)
+        self._file_etag = file_body.etag.strip('"')
+
+    # aiohttp >= 3.8 sets its own ETag in `prepare`, through this property
+    if hasattr(web.StreamResponse, "etag"):
+        @web.FileResponse.etag.setter
+        def etag(self, value):
+            web.FileResponse.etag.fset(self, self._file_etag)
+
+
+def file_response(request, file_body: FileBody) -> web.StreamResponse:
+    """
+    Answer `request` with a body sent from its file, or with 304 when the
+    client copy is still valid. Range requests are served by FileResponse.
+    """
+    file_body = file_body.negotiate(request)
+    if is_not_modified(request, file_body.etag, file_body.last_modified):
+        return web.Response(status=304, headers=file_body.validator_headers)
+    return _FileBodyResponse(file_body)
+
+
+def prepared_response(request, prepared: PreparedBody):
+    """
+    Answer `request` with a prepared body, or with 304 when the client copy
+    is still valid
+    """
+    prepared = prepared.negotiate(request)
+    if is_not_modified(request, prepared.etag, prepared.last_modified):
+        return web.Response(status=304, headers=prepared.validator_headers)
+    return web.Response(body=prepared.body, headers=prepared.headers)
@@ -0,0 +1,107 @@
+_json = None
+
+
+def _json_module():
+    # ujson is imported on first use, like the other optional speedups
+    global _json
+    if _json is None:
+        try:
+            import ujson as json
+        except ImportError:  # pragma: no cover
+            import json
+        _json = json
+    return _json
+
+
+def loads(s):
+    return _json_module().loads(s)
+
+
+def _stringify_keys(obj):
+    if isinstance(obj, dict):
+        return {str(key): _stringify_keys(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_stringify_keys(value) for value in obj]
+    return obj
+
+
+def dumps_canonical(obj) -> str:
+    """
+    Serialize `obj` with sorted keys.
+
+    YAML gives non string keys for unquoted numbers (`200:` next to
+    `default:` in `responses`), which can not be sorted together; they are
+    converted to strings first, as JSON does anyway.
+    """
+    json = _json_module()
+    try:
+        return json.dumps(obj, sort_keys=True)
+    except TypeError:
+        return json.dumps(_stringify_keys(obj), sort_keys=True)
+
+
+# Size of the chunks written by the streaming encoder
+CHUNK_SIZE = 64 * 1024
+
+
+def _iter_swagger_json(base: dict, urls, path_fragment):
+    json = _json_module()
+    yield "{"
+    for i, key in enumerate(sorted(set(base) | {"paths"})):
+        yield "{}{}:".format("," if i else "", json.dumps(key))
+        if key != "paths":
+            yield dumps_canonical(base[key])
+            continue
+        yield "{"
+        for j, url in enumerate(sorted(urls)):
+            yield "{}{}:".format("," if j else "", json.dumps(url))
+            yield path_fragment(url)
+        yield "}"
+    yield "}"
+
+
+def iter_swagger_json(base: dict, path_fragments: dict):
+    """
+    Iterate over the pieces of the Swagger document made of its top level
+    keys and the serialized path items (`{url: json_str}`), in canonical
+    key order
+    """
+    return _iter_swagger_json(base, path_fragments,
+                              path_fragments.__getitem__)
+
+
+def iter_document_json(document: dict):
+    """
+    Iterate over the pieces of the canonical JSON of a parsed Swagger
+    document, serializing one path item at a time
+    """
+    paths = document.get("paths") or {}
+    base = {key: value for key, value in document.items() if key != "paths"}
+    return _iter_swagger_json(base, paths,
+                              lambda url: dumps_canonical(paths[url]))
+
+
+def iter_encoded(pieces, chunk_size: int = CHUNK_SIZE):
+    """
+    Encode str pieces to UTF-8 and group them in chunks of about
+    `chunk_size` bytes
+    """
+    buffer = []
+    size = 0
+    for piece in pieces:
+        piece = piece.encode("utf-8")
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def join_swagger_json(base: dict, path_fragments: dict) -> str:
+    """
+    Assemble a Swagger document from its top level keys and the serialized
+    path items (`{url: json_str}`), in canonical key order
+    """
+    return "".join(iter_swagger_json(base, path_fragments))
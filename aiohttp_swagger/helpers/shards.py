@@ -0,0 +1,198 @@
+from urllib.parse import quote
+
+from .responses import PreparedBody
+from .serialization import dumps_canonical, loads
+
+
+# Tag of the operations without tags, as the Swagger UI groups them
+DEFAULT_TAG = "default"
+
+OPERATION_METHODS = frozenset(("get", "put", "post", "delete", "options",
+                               "head", "patch", "trace"))
+
+# Reusable objects that a shard only keeps when they are referenced
+_SWAGGER2_CONTAINERS = ("definitions", "parameters", "responses")
+_OPENAPI3_UNSHARED_COMPONENTS = ("securitySchemes",)
+
+
+def _iter_refs(obj):
+    """
+    Yield the `$ref` values found anywhere in `obj`
+    """
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, dict):
+            ref = obj.get("$ref")
+            if isinstance(ref, str):
+                yield ref
+            stack.extend(obj.values())
+        elif isinstance(obj, list):
+            stack.extend(obj)
+
+
+def _ref_target(ref: str):
+    """
+    Return the (container, name) a local `$ref` points into, or None when
+    it points outside of the prunable containers (or to another document)
+    """
+    if not ref.startswith("#/"):
+        return None
+    parts = [part.replace("~1", "/").replace("~0", "~")
+             for part in ref[2:].split("/")]
+    if len(parts) >= 2 and parts[0] in _SWAGGER2_CONTAINERS:
+        return (parts[0],), parts[1]
+    if (len(parts) >= 3 and parts[0] == "components"
+            and parts[1] not in _OPENAPI3_UNSHARED_COMPONENTS):
+        return ("components", parts[1]), parts[2]
+    return None
+
+
+def _get_container(document: dict, container: tuple):
+    for key in container:
+        document = document.get(key)
+        if not isinstance(document, dict):
+            return None
+    return document
+
+
+def _referenced_objects(document: dict, roots) -> dict:
+    """
+    Transitive closure of the objects referenced from `roots`, as
+    {container: {name: object}}
+    """
+    found = {}
+    pending = [ref for root in roots for ref in _iter_refs(root)]
+    seen = set()
+    while pending:
+        ref = pending.pop()
+        if ref in seen:
+            continue
+        seen.add(ref)
+
+        target = _ref_target(ref)
+        if target is None:
+            continue
+        container, name = target
+        objects = _get_container(document, container)
+        if objects is None or name not in objects:
+            continue
+        selected = found.setdefault(container, {})
+        if name not in selected:
+            selected[name] = objects[name]
+            pending.extend(_iter_refs(objects[name]))
+    return found
+
+
+def _operation_tags(operation) -> list:
+    tags = operation.get("tags") if isinstance(operation, dict) else None
+    return list(tags) if tags else [DEFAULT_TAG]
+
+
+def split_by_tag(document: dict) -> dict:
+    """
+    Split a Swagger (or OpenAPI 3) document into one document per tag.
+
+    Each shard holds the operations of its tag, the top level keys of the
+    document, and only the `definitions` / `components` objects its
+    operations reference, directly or through other objects. Operations
+    without tags go to the "default" shard; operations with several tags are
+    in each of their shards. Returns {tag: document}.
+    """
+    paths = {}
+    for url, path_item in (document.get("paths") or {}).items():
+        if not isinstance(path_item, dict):
+            continue
+        shared = {key: value for key, value in path_item.items()
+                  if key not in OPERATION_METHODS}
+        for method, operation in path_item.items():
+            if method not in OPERATION_METHODS:
+                continue
+            for tag in _operation_tags(operation):
+                tag_paths = paths.setdefault(tag, {})
+                if url not in tag_paths:
+                    tag_paths[url] = dict(shared)
+                tag_paths[url][method] = operation
+
+    containers = {container for container in
+                  [(name,) for name in _SWAGGER2_CONTAINERS] +
+                  [("components", name)
+                   for name in document.get("components") or {}
+                   if name not in _OPENAPI3_UNSHARED_COMPONENTS]
+                  if _get_container(document, container) is not None}
+    tag_objects = {tag_object.get("name"): tag_object
+                   for tag_object in document.get("tags") or []
+                   if isinstance(tag_object, dict)}
+
+    shards = {}
+    for tag, tag_paths in paths.items():
+        shard = {key: value for key, value in document.items()
+                 if key not in ("paths", "tags", "components") and
+                 (key,) not in containers}
+        if "components" in document:
+            shard["components"] = {
+                name: value
+                for name, value in document["components"].items()
+                if ("components", name) not in containers
+            }
+        if tag in tag_objects:
+            shard["tags"] = [tag_objects[tag]]
+        shard["paths"] = tag_paths
+
+        # Top level parameters and responses may reference objects too
+        roots = [tag_paths] + [
+            value for key, value in shard.items()
+            if key not in ("paths", "components")
+        ] + list(shard.get("components", {}).values())
+        for container, objects in _referenced_objects(
+                document, roots).items():
+            target = shard
+            for key in container[:-1]:
+                target = target.setdefault(key, {})
+            target[container[-1]] = objects
+        shards[tag] = shard
+    return shards
+
+
+class TagShards(object):
+    """
+    The per-tag documents of a Swagger definition, encoded and ready to be
+    served, together with an index listing them.
+
+    `url_pattern` is the URL of a shard, with `{}` standing for the (quoted)
+    tag name. `content` is the JSON of the definition, or its parsed
+    document.
+    """
+    __slots__ = ("bodies", "index")
+
+    def __init__(self, content, url_pattern: str,
+                 cache_control: str = "no-cache"):
+        shards = split_by_tag(content if isinstance(content, dict)
+                              else loads(content))
+        self.bodies = {
+            tag: PreparedBody.from_text(dumps_canonical(shard),
+                                        "application/json",
+                                        cache_control=cache_control)
+            for tag, shard in shards.items()
+        }
+        index = {"tags": [
+            {
+                "name": tag,
+                "url": url_pattern.format(quote(tag, safe="")),
+                "operations": sum(
+                    method in OPERATION_METHODS
+                    for path_item in shards[tag]["paths"].values()
+                    for method in path_item),
+                "size": len(self.bodies[tag].body),
+            }
+            for tag in sorted(shards)
+        ]}
+        self.index = PreparedBody.from_text(dumps_canonical(index),
+                                            "application/json",
+                                            cache_control=cache_control)
+
+    def get(self, tag: str):
+        return self.bodies.get(tag)
+
+
+__all__ = ("TagShards", "split_by_tag")
@@ -0,0 +1,43 @@
+import hashlib
+import re
+from os.path import join, splitext
+
+
+STATIC_PLACEHOLDER = "##STATIC_PATH##"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_STATIC_REFERENCE = re.compile(
+    re.escape(STATIC_PLACEHOLDER) + r"/([^\"'\s?#]+)")
+
+
+def fingerprint_name(name: str, digest: str) -> str:
+    """
+    Insert `digest` before the extension: `js/app.js` -> `js/app.<digest>.js`
+    """
+    stem, ext = splitext(name)
+    return "{}.{}{}".format(stem, digest, ext)
+
+
+def fingerprint_static_references(template: str, directory: str, files):
+    """
+    Rewrite the `##STATIC_PATH##/<name>` references of `template` that point
+    to one of `files` with content-hashed names.
+
+    Returns the new template and a mapping from fingerprinted name to real
+    file name.
+    """
+    fingerprints = {}
+
+    def _replace(match):
+        name = match.group(1)
+        if name not in files:
+            return match.group(0)
+
+        with open(join(directory, name), "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        hashed_name = fingerprint_name(name, digest)
+        fingerprints[hashed_name] = name
+        return "{}/{}".format(STATIC_PLACEHOLDER, hashed_name)
+
+    return _STATIC_REFERENCE.sub(_replace, template), fingerprints
@@ -0,0 +1,98 @@
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+
+# A step of the build: "base_document" (or "render_template" and
+# "parse_template" for a custom template), "collect_routes", "parse_docs",
+# "serialize_paths", "serialize", "compile_validators", "tag_shards",
+# "write_file" (with `sendfile_path`), "compress" (in its own thread, after
+# the build), "shared_cache" (the whole build when a shared artifact is
+# loaded or published, see `SharedArtifactCache`), "load_static" (Swagger UI
+# assets read in memory), and the totals "build" and "refresh". `details`
+# holds counters specific to the phase.
+PhaseEvent = namedtuple("PhaseEvent", "phase duration details")
+
+# The documentation of one operation. `source` is "docstring" or "file";
+# `cached` is true when it was not parsed for this route (shared docstring,
+# memoized `swagger_path` file or `yaml_cache_dir` hit).
+RouteEvent = namedtuple(
+    "RouteEvent", "method path handler source bytes duration cached")
+
+
+@contextmanager
+def traced_phase(trace, phase: str, **details):
+    """
+    Time the body of the `with` block and report it to `trace` as a
+    PhaseEvent. The block may add counters to the yielded `details`.
+    """
+    if trace is None:
+        yield details
+        return
+    start = time.perf_counter()
+    yield details
+    trace(PhaseEvent(phase, time.perf_counter() - start, details))
+
+
+def handler_name(handler, method: str = None) -> str:
+    """
+    Qualified name of a route handler (of the method, for class based views)
+    """
+    name = "{}.{}".format(getattr(handler, "__module__", None),
+                          getattr(handler, "__qualname__", repr(handler)))
+    if method is not None:
+        name = "{}.{}".format(name, method)
+    return name
+
+
+class SwaggerTimings(object):
+    """
+    Collect the events of a build, to be passed as the `trace` argument of
+    `setup_swagger` or `generate_doc_from_each_end_point`:
+
+        timings = SwaggerTimings()
+        setup_swagger(app, trace=timings)
+        print(timings.summary())
+    """
+
+    def __init__(self):
+        self.phases = []
+        self.routes = []
+
+    def __call__(self, event):
+        if isinstance(event, RouteEvent):
+            self.routes.append(event)
+        else:
+            self.phases.append(event)
+
+    def phase_durations(self) -> dict:
+        """
+        Total duration of every phase, as {phase: seconds}
+        """
+        durations = {}
+        for event in self.phases:
+            durations[event.phase] = (durations.get(event.phase, 0.0) +
+                                      event.duration)
+        return durations
+
+    def slowest(self, n: int = 10) -> list:
+        """
+        The `n` route events that took the longest
+        """
+        return sorted(self.routes, key=lambda event: event.duration,
+                      reverse=True)[:n]
+
+    def summary(self, n: int = 10) -> str:
+        lines = ["{:>16}: {:9.3f} ms".format(phase, duration * 1000)
+                 for phase, duration in self.phase_durations().items()]
+        if self.routes:
+            lines.append("slowest of {} operations:".format(len(self.routes)))
+            lines.extend(
+                "{:9.3f} ms {:>7} {} ({}, {} bytes of {})".format(
+                    event.duration * 1000, event.method.upper(), event.path,
+                    event.handler, event.bytes, event.source)
+                for event in self.slowest(n))
+        return "\n".join(lines)
+
+
+__all__ = ("PhaseEvent", "RouteEvent", "SwaggerTimings")
@@ -0,0 +1,606 @@
+import re
+
+from aiohttp import web
+
+from .mounts import swagger_mounts
+from .serialization import dumps_canonical, loads
+
+
+_MISSING = object()
+_INVALID = object()
+
+# Parameter keys which are not schema keywords (Swagger 2.0 parameters hold
+# their schema inline)
+_PARAMETER_KEYS = ("name", "in", "required", "description", "schema",
+                   "collectionFormat", "allowEmptyValue", "style", "explode",
+                   "deprecated", "example", "examples", "content")
+
+_COLLECTION_SEPARATORS = {"csv": ",", "ssv": " ", "tsv": "\t", "pipes": "|"}
+
+_TYPE_CHECKS = {
+    "object": "isinstance({v}, dict)",
+    "array": "isinstance({v}, list)",
+    "string": "isinstance({v}, str)",
+    "integer": "(isinstance({v}, int) and not isinstance({v}, bool))",
+    "number": "(isinstance({v}, (int, float)) and not isinstance({v}, bool))",
+    "boolean": "isinstance({v}, bool)",
+    "null": "{v} is None",
+}
+
+
+class RequestValidationError(web.HTTPBadRequest):
+    """
+    400 response listing the errors of a request, as
+    {"errors": [{"path": "query/limit", "message": "..."}]}
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(
+            text=dumps_canonical({"errors": [
+                {"path": path, "message": message}
+                for path, message in errors
+            ]}),
+            content_type="application/json")
+
+
+def _coerce_integer(value):
+    try:
+        return int(value)
+    except ValueError:
+        return _INVALID
+
+
+def _coerce_number(value):
+    try:
+        return float(value)
+    except ValueError:
+        return _INVALID
+
+
+def _coerce_boolean(value):
+    value = value.lower()
+    if value == "true":
+        return True
+    if value == "false":
+        return False
+    return _INVALID
+
+
+_COERCIONS = {
+    "integer": _coerce_integer,
+    "number": _coerce_number,
+    "boolean": _coerce_boolean,
+}
+
+
+def _number(value) -> str:
+    """
+    The source of a numeric keyword value
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError("{!r} is not a number".format(value))
+    return repr(value)
+
+
+class ValidatorCompiler(object):
+    """
+    Compile the operations of a Swagger document into Python functions.
+
+    Every schema is turned into the source of a function checking a value
+    against it, with one statement per keyword and no schema lookup left
+    for request time. `$ref` schemas become functions of their own, shared
+    by every operation referencing them (and allowing recursive schemas).
+    Only the keywords below are enforced; others (`format`, ...) are
+    ignored:
+
+        type, enum, nullable / x-nullable, allOf, $ref, minimum, maximum,
+        exclusiveMinimum, exclusiveMaximum, multipleOf, minLength,
+        maxLength, pattern, required, properties, additionalProperties,
+        minProperties, maxProperties, items, minItems, maxItems
+    """
+
+    def __init__(self, document: dict):
+        self.document = document
+        self.namespace = {
+            "_MISSING": _MISSING,
+            "_INVALID": _INVALID,
+            "_COERCIONS": _COERCIONS,
+        }
+        self._refs = {}
+        self._counter = 0
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _name(self, prefix: str) -> str:
+        self._counter += 1
+        return "{}{}".format(prefix, self._counter)
+
+    def _constant(self, value) -> str:
+        name = self._name("_c")
+        self.namespace[name] = value
+        return name
+
+    def _define(self, source: str):
+        exec(compile(source, "<swagger validators>", "exec"), self.namespace)
+
+    def resolve(self, ref: str):
+        if not ref.startswith("#/"):
+            raise ValueError("Only local $ref are supported: {}".format(ref))
+        target = self.document
+        for part in ref[2:].split("/"):
+            target = target[part.replace("~1", "/").replace("~0", "~")]
+        return target
+
+    # ------------------------------------------------------------------
+    # Schemas
+    # ------------------------------------------------------------------
+    def _ref_function(self, ref: str) -> str:
+        if ref not in self._refs:
+            name = self._refs[ref] = self._name("_ref")
+            lines = []
+            self._emit(self.resolve(ref), "value", "path", lines, 1)
+            self._define("def {}(value, path, errors):\n{}\n".format(
+                name, "\n".join(lines) or "    pass"))
+        return self._refs[ref]
+
+    def _emit(self, schema, v: str, path: str, lines: list, depth: int):
+        """
+        Append to `lines` the statements checking the local variable `v`
+        against `schema`. `path` is an expression giving the location of
+        the value, only evaluated when reporting an error.
+        """
+        if not isinstance(schema, dict):
+            return
+        pad = "    " * depth
+
+        def error(message, indent=1):
+            lines.append("{}errors.append(({}, {!r}))".format(
+                "    " * (depth + indent), path, message))
+
+        if "$ref" in schema:
+            lines.append("{}{}({}, {}, errors)".format(
+                pad, self._ref_function(schema["$ref"]), v, path))
+            return
+
+        if schema.get("nullable") or schema.get("x-nullable"):
+            lines.append("{}if {} is not None:".format(pad, v))
+            depth += 1
+            pad = "    " * depth
+            schema = dict(schema, nullable=False)
+            schema.pop("x-nullable", None)
+
+        for sub_schema in schema.get("allOf", ()):
+            self._emit(sub_schema, v, path, lines, depth)
+
+        types = schema.get("type")
+        if types is not None:
+            if isinstance(types, str):
+                types = [types]
+            checks = [_TYPE_CHECKS[t].format(v=v)
+                      for t in types if t in _TYPE_CHECKS]
+            if checks:
+                lines.append("{}if not ({}):".format(pad, " or ".join(checks)))
+                error("is not of type {}".format(" or ".join(types)))
+
+        if "enum" in schema:
+            try:
+                values = frozenset(schema["enum"])
+            except TypeError:
+                values = tuple(schema["enum"])
+            lines.append("{}if {} not in {}:".format(
+                pad, v, self._constant(values)))
+            error("is not one of {}".format(schema["enum"]))
+
+        self._emit_number(schema, v, lines, depth, error)
+        self._emit_string(schema, v, lines, depth, error)
+        self._emit_array(schema, v, path, lines, depth, error)
+        self._emit_object(schema, v, path, lines, depth, error)
+
+    def _emit_number(self, schema, v, lines, depth, error):
+        keywords = ("minimum", "maximum", "exclusiveMinimum",
+                    "exclusiveMaximum", "multipleOf")
+        if not any(keyword in schema for keyword in keywords):
+            return
+        lines.append("{}if {}:".format("    " * depth,
+                                       _TYPE_CHECKS["number"].format(v=v)))
+        lines.append("{}pass".format("    " * (depth + 1)))
+
+        def bound(keyword, operator, exclusive_operator):
+            if keyword not in schema:
+                return
+            exclusive = schema.get("exclusive" + keyword.capitalize())
+            if exclusive is True:
+                operator = exclusive_operator
+            lines.append("{}if {} {} {}:".format(
+                "    " * (depth + 1), v, operator, _number(schema[keyword])))
+            error("must be {} {}".format(
+                {"<": ">=", "<=": ">", ">": "<=", ">=": "<"}[operator],
+                schema[keyword]), indent=2)
+
+        bound("minimum", "<", "<=")
+        bound("maximum", ">", ">=")
+        # Numeric form of the exclusive bounds (JSON Schema draft 6+)
+        for keyword, operator in (("exclusiveMinimum", "<="),
+                                  ("exclusiveMaximum", ">=")):
+            limit = schema.get(keyword)
+            if isinstance(limit, (int, float)) and \
+                    not isinstance(limit, bool):
+                lines.append("{}if {} {} {}:".format(
+                    "    " * (depth + 1), v, operator, _number(limit)))
+                error("must be {} {}".format(
+                    ">" if operator == "<=" else "<", limit), indent=2)
+        if "multipleOf" in schema:
+            lines.append("{}if {} % {} != 0:".format(
+                "    " * (depth + 1), v, _number(schema["multipleOf"])))
+            error("is not a multiple of {}".format(schema["multipleOf"]),
+                  indent=2)
+
+    def _emit_string(self, schema, v, lines, depth, error):
+        keywords = ("minLength", "maxLength", "pattern")
+        if not any(keyword in schema for keyword in keywords):
+            return
+        lines.append("{}if isinstance({}, str):".format("    " * depth, v))
+        lines.append("{}pass".format("    " * (depth + 1)))
+        if "minLength" in schema:
+            lines.append("{}if len({}) < {}:".format(
+                "    " * (depth + 1), v, int(schema["minLength"])))
+            error("is shorter than {}".format(schema["minLength"]), indent=2)
+        if "maxLength" in schema:
+            lines.append("{}if len({}) > {}:".format(
+                "    " * (depth + 1), v, int(schema["maxLength"])))
+            error("is longer than {}".format(schema["maxLength"]), indent=2)
+        if "pattern" in schema:
+            lines.append("{}if {}.search({}) is None:".format(
+                "    " * (depth + 1),
+                self._constant(re.compile(schema["pattern"])), v))
+            error("does not match {!r}".format(schema["pattern"]), indent=2)
+
+    def _emit_array(self, schema, v, path, lines, depth, error):
+        keywords = ("minItems", "maxItems", "items")
+        if not any(keyword in schema for keyword in keywords):
+            return
+        lines.append("{}if isinstance({}, list):".format("    " * depth, v))
+        lines.append("{}pass".format("    " * (depth + 1)))
+        if "minItems" in schema:
+            lines.append("{}if len({}) < {}:".format(
+                "    " * (depth + 1), v, int(schema["minItems"])))
+            error("has less than {} items".format(schema["minItems"]),
+                  indent=2)
+        if "maxItems" in schema:
+            lines.append("{}if len({}) > {}:".format(
+                "    " * (depth + 1), v, int(schema["maxItems"])))
+            error("has more than {} items".format(schema["maxItems"]),
+                  indent=2)
+        if isinstance(schema.get("items"), dict):
+            index, item = self._name("i"), self._name("v")
+            items = []
+            self._emit(schema["items"], item,
+                       "{} + '/' + str({})".format(path, index), items,
+                       depth + 2)
+            if items:
+                lines.append("{}for {}, {} in enumerate({}):".format(
+                    "    " * (depth + 1), index, item, v))
+                lines.extend(items)
+
+    def _emit_object(self, schema, v, path, lines, depth, error):
+        keywords = ("required", "properties", "additionalProperties",
+                    "minProperties", "maxProperties")
+        if not any(keyword in schema for keyword in keywords):
+            return
+        pad = "    " * (depth + 1)
+        lines.append("{}if isinstance({}, dict):".format("    " * depth, v))
+        lines.append("{}pass".format(pad))
+
+        required = schema.get("required")
+        if isinstance(required, list):
+            for name in required:
+                lines.append("{}if {!r} not in {}:".format(pad, name, v))
+                lines.append("{}    errors.append(({} + {!r}, "
+                             "'is required'))".format(pad, path, "/" + name))
+
+        properties = schema.get("properties")
+        if not isinstance(properties, dict):
+            properties = {}
+        for name, property_schema in properties.items():
+            value = self._name("v")
+            checks = []
+            self._emit(property_schema, value,
+                       "{} + {!r}".format(path, "/" + str(name)), checks,
+                       depth + 2)
+            if checks:
+                lines.append("{}{} = {}.get({!r}, _MISSING)".format(
+                    pad, value, v, name))
+                lines.append("{}if {} is not _MISSING:".format(pad, value))
+                lines.extend(checks)
+
+        additional = schema.get("additionalProperties")
+        if additional is False or isinstance(additional, dict):
+            key = self._name("k")
+            known = self._constant(frozenset(properties))
+            lines.append("{}for {} in {}:".format(pad, key, v))
+            lines.append("{}    if {} not in {}:".format(pad, key, known))
+            if additional is False:
+                lines.append(
+                    "{}        errors.append(({} + '/' + str({}), "
+                    "'is not allowed'))".format(pad, path, key))
+            else:
+                value = self._name("v")
+                lines.append("{}        {} = {}[{}]".format(
+                    pad, value, v, key))
+                checks = []
+                self._emit(additional, value,
+                           "{} + '/' + str({})".format(path, key), checks,
+                           depth + 3)
+                lines.extend(checks or ["{}        pass".format(pad)])
+
+        for keyword, operator, message in (
+                ("minProperties", "<", "has less than {} properties"),
+                ("maxProperties", ">", "has more than {} properties")):
+            if keyword in schema:
+                lines.append("{}if len({}) {} {}:".format(
+                    pad, v, operator, int(schema[keyword])))
+                error(message.format(schema[keyword]), indent=2)
+
+    # ------------------------------------------------------------------
+    # Operations
+    # ------------------------------------------------------------------
+    def _emit_parameter(self, parameter, lines):
+        if "$ref" in parameter:
+            parameter = self.resolve(parameter["$ref"])
+        name, location = parameter.get("name"), parameter.get("in")
+        if not isinstance(name, str) or location == "body":
+            return
+
+        source = {"query": "query", "path": "match_info", "header": "headers",
+                  "cookie": "cookies", "formData": "form"}.get(location)
+        if source is None:
+            return
+
+        # OpenAPI 3 parameters have a schema, Swagger 2.0 ones are a schema
+        schema = parameter.get("schema")
+        openapi3 = isinstance(schema, dict)
+        if not openapi3:
+            schema = {key: value for key, value in parameter.items()
+                      if key not in _PARAMETER_KEYS}
+        elif "$ref" in schema:
+            schema = self.resolve(schema["$ref"])
+        path = repr("{}/{}".format(location, name))
+        value = self._name("v")
+
+        if schema.get("type") == "array":
+            collection = parameter.get("collectionFormat")
+            if collection is None and openapi3:
+                explode = parameter.get("explode",
+                                        parameter.get("style", "form")
+                                        == "form")
+                collection = ("multi" if explode and
+                              location in ("query", "cookie", "formData")
+                              else "csv")
+            if collection == "multi" and location in ("query", "formData"):
+                lines.append("    {} = {}.getall({!r}, None)".format(
+                    value, source, name))
+                lines.append("    {0} = _MISSING if {0} is None "
+                             "else list({0})".format(value))
+            else:
+                lines.append("    {} = {}.get({!r}, _MISSING)".format(
+                    value, source, name))
+                lines.append("    if {0} is not _MISSING:".format(value))
+                lines.append("        {0} = {0}.split({1!r})".format(
+                    value, _COLLECTION_SEPARATORS.get(collection, ",")))
+            items = schema.get("items")
+            if isinstance(items, dict) and "$ref" in items:
+                items = self.resolve(items["$ref"])
+            item_type = (items or {}).get("type")
+        else:
+            lines.append("    {} = {}.get({!r}, _MISSING)".format(
+                value, source, name))
+            item_type = None
+
+        lines.append("    if {} is _MISSING:".format(value))
+        if parameter.get("required"):
+            lines.append("        errors.append(({}, 'is required'))".format(
+                path))
+        elif "default" in schema:
+            lines.append("        params[{!r}] = {}".format(
+                name, self._constant(schema["default"])))
+        else:
+            lines.append("        pass")
+        lines.append("    else:")
+
+        coerced = True
+        if schema.get("type") in _COERCIONS:
+            lines.append("        {0} = _COERCIONS[{1!r}]({0})".format(
+                value, schema["type"]))
+        elif item_type in _COERCIONS:
+            lines.append("        {0} = [_COERCIONS[{1!r}](item) "
+                         "for item in {0}]".format(value, item_type))
+            lines.append("        if _INVALID in {0}:".format(value))
+            lines.append("            {} = _INVALID".format(value))
+        else:
+            coerced = False
+
+        # Strings need no conversion
+        depth = 2
+        if coerced:
+            lines.append("        if {} is _INVALID:".format(value))
+            lines.append("            errors.append(({}, 'is not a valid "
+                         "{}'))".format(path, item_type or schema["type"]))
+            lines.append("        else:")
+            depth = 3
+        checks = []
+        self._emit(schema, value, path, checks, depth)
+        lines.extend(checks)
+        lines.append("{}params[{!r}] = {}".format("    " * depth, name, value))
+
+    def _body(self, operation):
+        """
+        The (name, schema, required) of the JSON body of `operation`
+        """
+        for parameter in operation.get("parameters") or ():
+            if isinstance(parameter, dict) and "$ref" in parameter:
+                parameter = self.resolve(parameter["$ref"])
+            if isinstance(parameter, dict) and parameter.get("in") == "body":
+                return (parameter.get("name", "body"),
+                        parameter.get("schema") or {},
+                        bool(parameter.get("required")))
+
+        request_body = operation.get("requestBody")
+        if isinstance(request_body, dict):
+            if "$ref" in request_body:
+                request_body = self.resolve(request_body["$ref"])
+            content = request_body.get("content") or {}
+            media = content.get("application/json")
+            if media is not None:
+                return ("body", (media or {}).get("schema") or {},
+                        bool(request_body.get("required")))
+        return None
+
+    def compile_operation(self, operation: dict):
+        """
+        Return an OperationValidator for `operation`, or None when it has
+        nothing to validate
+        """
+        if not isinstance(operation, dict):
+            return None
+
+        lines = []
+        for parameter in operation.get("parameters") or ():
+            if isinstance(parameter, dict):
+                self._emit_parameter(parameter, lines)
+
+        body = self._body(operation)
+        if body is not None:
+            name, schema, required = body
+            lines.append("    if body is _MISSING:")
+            if required:
+                lines.append("        errors.append(('body', 'is required'))")
+            else:
+                lines.append("        pass")
+            lines.append("    else:")
+            checks = []
+            self._emit(schema, "body", "'body'", checks, 2)
+            lines.extend(checks)
+            lines.append("        params[{!r}] = body".format(name))
+
+        if not lines:
+            return None
+
+        function = self._name("_operation")
+        self._define(
+            "def {}(query, match_info, headers, cookies, form, body, "
+            "errors):\n    params = {{}}\n{}\n    return params\n".format(
+                function, "\n".join(lines)))
+        uses_form = any(
+            isinstance(parameter, dict) and parameter.get("in") == "formData"
+            for parameter in operation.get("parameters") or ())
+        return OperationValidator(self.namespace[function],
+                                  has_body=body is not None,
+                                  uses_form=uses_form)
+
+
+class OperationValidator(object):
+    """
+    The compiled checks of one operation
+    """
+    __slots__ = ("function", "has_body", "uses_form")
+
+    def __init__(self, function, has_body: bool, uses_form: bool):
+        self.function = function
+        self.has_body = has_body
+        self.uses_form = uses_form
+
+    async def validate(self, request) -> dict:
+        """
+        Check `request`, raising RequestValidationError on errors. Returns
+        the parameters, converted to their types (and the parsed body).
+        """
+        errors = []
+        body = _MISSING
+        if self.has_body and request.body_exists:
+            raw = await request.read()
+            if raw:
+                try:
+                    body = loads(raw)
+                except ValueError:
+                    raise RequestValidationError(
+                        [("body", "is not valid JSON")])
+        form = await request.post() if self.uses_form else None
+
+        params = self.function(request.query, request.match_info,
+                               request.headers, request.cookies, form, body,
+                               errors)
+        if errors:
+            raise RequestValidationError(errors)
+        return params
+
+
+class RequestValidators(object):
+    """
+    The validators of every documented operation of a SwaggerIndex, by
+    route and method, compiled when the definition is built or refreshed
+    """
+
+    def __init__(self):
+        self._validators = {}
+        self._operations = {}
+
+    def update(self, index):
+        """
+        Compile the operations of the routes added to `index` since the
+        last update; unchanged routes keep their validators
+        """
+        compiler = ValidatorCompiler(index.base)
+        validators, operations = {}, {}
+        for route in index.routes:
+            for method, operation in index.operations(route).items():
+                key = (route, method.upper())
+                operations[key] = operation
+                if self._operations.get(key) is operation:
+                    validator = self._validators.get(key)
+                else:
+                    validator = self._compile(compiler, operation, route,
+                                              method, index)
+                if validator is not None:
+                    validators[key] = validator
+        self._validators, self._operations = validators, operations
+
+    @staticmethod
+    def _compile(compiler, operation, route, method, index):
+        try:
+            return compiler.compile_operation(operation)
+        except (KeyError, TypeError, ValueError, re.error) as e:
+            raise ValueError(
+                "Can not compile the request validator of {} {}: {!r}".format(
+                    method.upper(), index.routes[route][0], e))
+
+    def get(self, route, method: str):
+        validator = self._validators.get((route, method))
+        if validator is None:
+            # Function handlers added for every method
+            validator = self._validators.get((route, "*"))
+        return validator
+
+
+@web.middleware
+async def swagger_validation_middleware(request, handler):
+    """
+    Validate requests against the documentation of the matched operation.
+    The converted parameters are stored in `request["swagger_params"]`.
+    """
+    for mount in swagger_mounts(request.app).values():
+        swagger_def = mount.definition
+        if not swagger_def.validate:
+            continue
+        if swagger_def.validators is None:
+            await swagger_def.get()
+        validator = swagger_def.validators.get(request.match_info.route,
+                                               request.method)
+        if validator is not None:
+            request["swagger_params"] = await validator.validate(request)
+            break
+    return await handler(request)
+
+
+__all__ = ("RequestValidationError", "swagger_validation_middleware")
@@ -0,0 +1,38 @@
+# PyYAML is only imported the first time a document is parsed: applications
+# serving a prebuilt definition never pay for it
+
+_loader = None
+
+
+def _default_loader():
+    global _loader
+    if _loader is None:
+        import yaml
+
+        # libyaml is an optional part of PyYAML; both loaders give the same
+        # results
+        _loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return _loader
+
+
+def load_yaml(stream, loader=None):
+    """
+    Parse a YAML document with the fastest safe loader available
+    """
+    import yaml
+
+    return yaml.load(stream, Loader=loader or _default_loader())
+
+
+def libyaml_available() -> bool:
+    return _default_loader().__name__ == "CSafeLoader"
+
+
+def yaml_error():
+    """
+    The base class of PyYAML errors, to catch them without importing PyYAML
+    up front
+    """
+    import yaml
+
+    return yaml.YAMLError
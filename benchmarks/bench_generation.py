@@ -0,0 +1,181 @@
+"""
+Wall time, peak RSS and allocations of the Swagger definition generation,
+for synthetic applications of growing size.
+
+    PYTHONPATH=. python benchmarks/bench_generation.py -o results.json
+    PYTHONPATH=. python benchmarks/bench_generation.py --routes 10 1000 --quick
+
+Every measurement runs in a fresh interpreter, so that the peak RSS and the
+in-process caches of one scenario do not leak into the next one. Wall time
+and RSS are measured in one run, allocations (tracemalloc) in another, as
+tracing slows the code down. Compare two result files with compare.py.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+TARGETS = ("generate_doc_from_each_end_point", "setup_swagger")
+UI_VERSIONS = (2, 3)
+ROUTES = (10, 100, 1000, 5000, 20000)
+
+
+def _peak_rss_kb() -> int:
+    import resource
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def run_scenario(scenario: dict, trace: bool) -> dict:
+    """
+    Build the application of `scenario` and measure its target, in this
+    process
+    """
+    from aiohttp_swagger import setup_swagger
+    from aiohttp_swagger.helpers import generate_doc_from_each_end_point
+    from synthetic import make_app, make_definitions
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(scenario["routes"], parameters=scenario["parameters"],
+                       swagger_path_dir=directory)
+        definitions = make_definitions(scenario["definitions"])
+
+        if scenario["target"] == "setup_swagger":
+            def target():
+                setup_swagger(app, ui_version=scenario["ui_version"],
+                              definitions=definitions)
+        else:
+            def target():
+                generate_doc_from_each_end_point(
+                    app, ui_version=scenario["ui_version"],
+                    definitions=definitions)
+
+        if trace:
+            tracemalloc.start()
+            target()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return {"alloc_peak_bytes": peak, "alloc_retained_bytes": current}
+
+        rss_before = _peak_rss_kb()
+        start = time.perf_counter()
+        target()
+        wall = time.perf_counter() - start
+        return {
+            "wall_s": wall,
+            "peak_rss_kb": _peak_rss_kb(),
+            "rss_growth_kb": _peak_rss_kb() - rss_before,
+        }
+
+
+def _run_child(scenario: dict, trace: bool) -> dict:
+    command = [sys.executable, __file__, "--child", json.dumps(scenario)]
+    if trace:
+        command.append("--trace")
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.dirname(os.path.abspath(__file__)),
+         env.get("PYTHONPATH", "")])
+    output = subprocess.run(command, env=env, check=True,
+                            stdout=subprocess.PIPE).stdout
+    return json.loads(output.decode("utf-8"))
+
+
+def measure(scenario: dict, repeat: int, trace: bool) -> dict:
+    runs = [_run_child(scenario, trace=False) for _ in range(repeat)]
+    result = dict(scenario)
+    # The fastest run is the least disturbed by the rest of the machine
+    result.update(min(runs, key=lambda run: run["wall_s"]))
+    if trace:
+        result.update(_run_child(scenario, trace=True))
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], check=True,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def scenarios(options):
+    for routes, parameters, ui_version, target in itertools.product(
+            options.routes, options.parameters, options.ui_versions,
+            options.targets):
+        yield {
+            "target": target,
+            "ui_version": ui_version,
+            "routes": routes,
+            "parameters": parameters,
+            "definitions": max(20, routes // 10),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-o", "--output",
+                        help="write the results to this JSON file")
+    parser.add_argument("--routes", type=int, nargs="+", default=ROUTES)
+    parser.add_argument("--parameters", type=int, nargs="+", default=(3,),
+                        help="query parameters per operation (docstring "
+                             "size)")
+    parser.add_argument("--ui-versions", type=int, nargs="+",
+                        default=UI_VERSIONS)
+    parser.add_argument("--targets", nargs="+", choices=TARGETS,
+                        default=TARGETS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--quick", action="store_true",
+                        help="one run per scenario, without tracemalloc")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--trace", action="store_true",
+                        help=argparse.SUPPRESS)
+    options = parser.parse_args(argv)
+
+    if options.child:
+        json.dump(run_scenario(json.loads(options.child), options.trace),
+                  sys.stdout)
+        return
+
+    repeat = 1 if options.quick else options.repeat
+    results = []
+    print("{:>33} {:>3} {:>6} {:>6} {:>9} {:>10} {:>11}".format(
+        "target", "ui", "routes", "params", "wall (s)", "RSS (MB)",
+        "alloc (MB)"))
+    for scenario in scenarios(options):
+        result = measure(scenario, repeat, trace=not options.quick)
+        results.append(result)
+        print("{:>33} {:>3} {:>6} {:>6} {:>9.3f} {:>10.1f} {:>11}".format(
+            result["target"], result["ui_version"], result["routes"],
+            result["parameters"], result["wall_s"],
+            result["peak_rss_kb"] / 1024,
+            "{:.1f}".format(result["alloc_peak_bytes"] / 1024 ** 2)
+            if "alloc_peak_bytes" in result else "-"))
+
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump({
+                "commit": _git_commit(),
+                "date": datetime.datetime.now(
+                    datetime.timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "repeat": repeat,
+                "results": results,
+            }, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Per-request CPU cost of serving swagger.json from a str (encoded on every
+request) versus from a PreparedBody (encoded once at setup).
+
+    PYTHONPATH=. python benchmarks/bench_prepared_body.py
+"""
+import json
+import timeit
+
+from aiohttp import web
+
+from aiohttp_swagger.helpers.responses import PreparedBody
+
+SIZES = (
+    ("100 KB", 100 * 1024),
+    ("1 MB", 1024 ** 2),
+    ("10 MB", 10 * 1024 ** 2),
+)
+
+
+def make_spec(size: int) -> str:
+    operation = {
+        "description": "Synthetic operation ñ",
+        "tags": ["Benchmark"],
+        "responses": {"200": {"description": "successful operation"}},
+    }
+    paths = {}
+    spec = {"swagger": "2.0", "paths": paths}
+    i = 0
+    while len(json.dumps(spec)) < size:
+        for _ in range(100):
+            paths["/path/{}".format(i)] = {"get": operation}
+            i += 1
+    return json.dumps(spec, sort_keys=True)
+
+
+def main():
+    print("{:>8} {:>16} {:>16} {:>9}".format(
+        "size", "str (us/req)", "bytes (us/req)", "speedup"))
+    for label, size in SIZES:
+        text = make_spec(size)
+        prepared = PreparedBody.from_text(text, "application/json")
+
+        number = max(5, int(2e8 // size))
+        per_text = min(timeit.repeat(
+            lambda: web.json_response(text=text),
+            number=number, repeat=5)) / number
+        per_bytes = min(timeit.repeat(
+            lambda: web.Response(body=prepared.body,
+                                 headers=prepared.headers),
+            number=number, repeat=5)) / number
+
+        print("{:>8} {:>16.1f} {:>16.1f} {:>8.0f}x".format(
+            label, per_text * 1e6, per_bytes * 1e6, per_text / per_bytes))
+
+
+if __name__ == '__main__':
+    main()
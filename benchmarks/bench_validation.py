@@ -0,0 +1,174 @@
+"""
+Per-request cost of validating parameters and a JSON body with the compiled
+validators of `validate_requests`, against a generic schema walker (and
+jsonschema, when it is installed).
+
+    PYTHONPATH=. python benchmarks/bench_validation.py
+"""
+import re
+import timeit
+
+from multidict import MultiDict
+
+from aiohttp_swagger.helpers.validation import ValidatorCompiler
+
+DEFINITIONS = {
+    "Address": {
+        "type": "object",
+        "required": ["street", "city"],
+        "properties": {
+            "street": {"type": "string", "maxLength": 100},
+            "city": {"type": "string", "maxLength": 50},
+            "zip": {"type": "string", "pattern": "^[0-9]{5}$"},
+        },
+    },
+    "User": {
+        "type": "object",
+        "required": ["name", "email"],
+        "properties": {
+            "name": {"type": "string", "minLength": 1, "maxLength": 50},
+            "email": {"type": "string", "pattern": "^[^@]+@[^@]+$"},
+            "age": {"type": "integer", "minimum": 0, "maximum": 150},
+            "role": {"type": "string", "enum": ["admin", "user", "guest"]},
+            "addresses": {"type": "array", "maxItems": 10,
+                          "items": {"$ref": "#/definitions/Address"}},
+            "tags": {"type": "array", "items": {"type": "string"}},
+        },
+    },
+}
+
+OPERATION = {
+    "parameters": [
+        {"in": "query", "name": "limit", "type": "integer", "minimum": 1,
+         "maximum": 100},
+        {"in": "query", "name": "sort", "type": "string",
+         "enum": ["name", "age"]},
+        {"in": "body", "name": "user", "required": True,
+         "schema": {"$ref": "#/definitions/User"}},
+    ],
+}
+
+BODY = {
+    "name": "Jane Doe",
+    "email": "jane@example.com",
+    "age": 42,
+    "role": "admin",
+    "addresses": [
+        {"street": "1 Main St", "city": "Springfield", "zip": "12345"},
+        {"street": "2 Side St", "city": "Shelbyville", "zip": "54321"},
+    ],
+    "tags": ["a", "b", "c"],
+}
+
+QUERY = MultiDict([("limit", "10"), ("sort", "name")])
+
+_TYPES = {
+    "object": dict, "array": list, "string": str, "boolean": bool,
+    "integer": int, "number": (int, float),
+}
+
+
+def naive_validate(schema, value, document, path="", errors=None):
+    """
+    A schema interpreter: every keyword is looked up for every value
+    """
+    if errors is None:
+        errors = []
+    if "$ref" in schema:
+        target = document
+        for part in schema["$ref"][2:].split("/"):
+            target = target[part]
+        return naive_validate(target, value, document, path, errors)
+    expected = schema.get("type")
+    if expected is not None and not isinstance(value, _TYPES[expected]):
+        errors.append((path, "is not of type " + expected))
+        return errors
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append((path, "is not one of the values"))
+    if "minimum" in schema and value < schema["minimum"]:
+        errors.append((path, "is too small"))
+    if "maximum" in schema and value > schema["maximum"]:
+        errors.append((path, "is too large"))
+    if "minLength" in schema and len(value) < schema["minLength"]:
+        errors.append((path, "is too short"))
+    if "maxLength" in schema and len(value) > schema["maxLength"]:
+        errors.append((path, "is too long"))
+    if "pattern" in schema and not re.search(schema["pattern"], value):
+        errors.append((path, "does not match"))
+    if "maxItems" in schema and len(value) > schema["maxItems"]:
+        errors.append((path, "has too many items"))
+    for name in schema.get("required", ()):
+        if name not in value:
+            errors.append((path + "/" + name, "is required"))
+    for name, sub_schema in schema.get("properties", {}).items():
+        if isinstance(value, dict) and name in value:
+            naive_validate(sub_schema, value[name], document,
+                           path + "/" + name, errors)
+    if "items" in schema:
+        for i, item in enumerate(value):
+            naive_validate(schema["items"], item, document,
+                           "{}/{}".format(path, i), errors)
+    return errors
+
+
+def naive_request(query, body):
+    errors = []
+    params = {}
+    for parameter in OPERATION["parameters"]:
+        if parameter["in"] == "body":
+            naive_validate(parameter["schema"], body,
+                           {"definitions": DEFINITIONS}, "body", errors)
+            params[parameter["name"]] = body
+        elif parameter["name"] in query:
+            value = query[parameter["name"]]
+            if parameter["type"] == "integer":
+                value = int(value)
+            schema = {key: value for key, value in parameter.items()
+                      if key not in ("in", "name", "required")}
+            naive_validate(schema, value, {}, parameter["name"], errors)
+            params[parameter["name"]] = value
+    return params, errors
+
+
+def _us_per_call(function, number=20000):
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    compiled = ValidatorCompiler(
+        {"definitions": DEFINITIONS}).compile_operation(OPERATION).function
+
+    def run_compiled():
+        errors = []
+        compiled(QUERY, {}, {}, {}, None, BODY, errors)
+        assert not errors
+
+    def run_naive():
+        assert not naive_request(QUERY, BODY)[1]
+
+    results = [("compiled", _us_per_call(run_compiled)),
+               ("naive walker", _us_per_call(run_naive))]
+
+    try:
+        import jsonschema
+    except ImportError:
+        print("jsonschema is not installed, skipping it")
+    else:
+        schema = dict(DEFINITIONS["User"], definitions=DEFINITIONS)
+        validator = jsonschema.Draft4Validator(schema)
+
+        def run_jsonschema():
+            limit = int(QUERY["limit"])
+            assert 1 <= limit <= 100 and QUERY["sort"] in ("name", "age")
+            assert not list(validator.iter_errors(BODY))
+
+        results.append(("jsonschema", _us_per_call(run_jsonschema, 2000)))
+
+    baseline = results[0][1]
+    for name, us in results:
+        print("{:>14}: {:8.2f} us/request {:6.1f}x".format(
+            name, us, us / baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Parse a synthetic corpus of docstrings with every YAML loader available.
+
+    PYTHONPATH=. python benchmarks/bench_yaml_loader.py [number of docstrings]
+"""
+import sys
+import time
+
+import yaml
+
+from aiohttp_swagger.helpers.yaml_loader import libyaml_available
+from synthetic import make_fragment
+
+
+def _time(load, corpus):
+    start = time.perf_counter()
+    results = [load(document) for document in corpus]
+    return time.perf_counter() - start, results
+
+
+def main(count: int):
+    corpus = [make_fragment(i) for i in range(count)]
+    loaders = [
+        ("yaml.full_load", yaml.full_load),
+        ("SafeLoader", lambda d: yaml.load(d, Loader=yaml.SafeLoader)),
+    ]
+    if libyaml_available():
+        loaders.append(
+            ("CSafeLoader", lambda d: yaml.load(d, Loader=yaml.CSafeLoader)))
+
+    print("{} docstrings, {:.1f} KB of YAML".format(
+        count, sum(map(len, corpus)) / 1024))
+
+    reference = None
+    baseline = None
+    for name, load in loaders:
+        elapsed, results = _time(load, corpus)
+        if reference is None:
+            reference, baseline = results, elapsed
+        assert results == reference, "{} gives different results".format(name)
+        print("{:>16}: {:8.3f} s {:6.1f}x".format(
+            name, elapsed, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
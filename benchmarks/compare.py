@@ -0,0 +1,71 @@
+"""
+Compare two result files of bench_generation.py.
+
+    python benchmarks/compare.py before.json after.json [--threshold 10]
+
+Exits with status 1 when a metric of a scenario grew by more than the
+threshold (in percent).
+"""
+import argparse
+import json
+import sys
+
+METRICS = ("wall_s", "peak_rss_kb", "alloc_peak_bytes")
+SCENARIO_KEYS = ("target", "ui_version", "routes", "parameters",
+                 "definitions")
+
+
+def _load(path: str) -> dict:
+    with open(path) as f:
+        data = json.load(f)
+    return {
+        tuple(result[key] for key in SCENARIO_KEYS): result
+        for result in data["results"]
+    }, data.get("commit")
+
+
+def compare(before: dict, after: dict, threshold: float) -> list:
+    """
+    Return the (scenario, metric, before, after, change %) rows of the
+    scenarios measured in both files, and the regressions among them
+    """
+    rows, regressions = [], []
+    for scenario in sorted(set(before) & set(after), key=str):
+        for metric in METRICS:
+            if metric not in before[scenario] or metric not in after[scenario]:
+                continue
+            old, new = before[scenario][metric], after[scenario][metric]
+            change = (new - old) * 100.0 / old if old else 0.0
+            row = (scenario, metric, old, new, change)
+            rows.append(row)
+            if change > threshold:
+                regressions.append(row)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="regression threshold, in percent")
+    options = parser.parse_args(argv)
+
+    before, before_commit = _load(options.before)
+    after, after_commit = _load(options.after)
+    rows, regressions = compare(before, after, options.threshold)
+
+    print("{} -> {}".format(before_commit, after_commit))
+    for (target, ui, routes, params, _), metric, old, new, change in rows:
+        print("{:>33} ui{} {:>6} routes {:>3} params {:>16}: "
+              "{:>14.3f} -> {:>14.3f} {:+7.1f}%{}".format(
+                  target, ui, routes, params, metric, old, new, change,
+                  " !" if change > options.threshold else ""))
+    if regressions:
+        print("{} regression(s) above {}%".format(
+            len(regressions), options.threshold))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Synthetic Swagger documentation used by the benchmarks
+"""
+
+DOCSTRING_TEMPLATE = '''
+    Handler {i} description, only for Sphinx.
+
+    ---
+    description: Synthetic end-point number {i}.
+    tags:
+    - Group {group}
+    produces:
+    - application/json
+    parameters:
+{parameters}
+    responses:
+        "200":
+            description: successful operation
+            schema:
+              $ref: '#/definitions/Model{group}'
+        "404":
+            description: not found
+'''
+
+PARAMETER_TEMPLATE = '''    - in: query
+      name: param_{i}_{j}
+      description: Parameter {j} of end-point {i}
+      required: false
+      type: string
+      enum: ["a", "b", "c"]
+'''
+
+
+def make_docstring(i: int, parameters: int = 3, groups: int = 20) -> str:
+    return DOCSTRING_TEMPLATE.format(
+        i=i, group=i % groups,
+        parameters="".join(PARAMETER_TEMPLATE.format(i=i, j=j)
+                           for j in range(parameters)))
+
+
+def make_fragment(i: int, parameters: int = 3) -> str:
+    """
+    The YAML part of a synthetic docstring, as the builders parse it
+    """
+    return make_docstring(i, parameters).split("---", 1)[1]
+
+
+VIEW_METHODS = ("get", "post", "put", "patch", "delete")
+
+
+def make_definitions(count: int, properties: int = 10) -> dict:
+    """
+    `count` models, each one referencing the next one
+    """
+    definitions = {}
+    for i in range(count):
+        model = {
+            "type": "object",
+            "properties": {
+                "field_{}".format(j): {
+                    "type": "string",
+                    "description": "Field {} of model {}".format(j, i),
+                }
+                for j in range(properties)
+            },
+        }
+        model["properties"]["next"] = {
+            "$ref": "#/definitions/Model{}".format((i + 1) % count)}
+        definitions["Model{}".format(i)] = model
+    return definitions
+
+
+def _make_handler(doc):
+    async def handler(request):  # pragma: no cover
+        raise NotImplementedError
+
+    handler.__doc__ = doc
+    return handler
+
+
+def _make_view(i: int, parameters: int, groups: int):
+    from aiohttp import web
+
+    methods = {
+        method: _make_handler(make_docstring(i * len(VIEW_METHODS) + j,
+                                             parameters, groups))
+        for j, method in enumerate(VIEW_METHODS)
+    }
+    return type("View{}".format(i), (web.View,), methods)
+
+
+def make_app(routes: int, parameters: int = 3, groups: int = 20,
+             swagger_path_dir: str = None):
+    """
+    An application with `routes` documented routes: 60% function handlers,
+    20% `web.View` classes with 5 documented methods each and, when
+    `swagger_path_dir` is given, 20% handlers documented with `swagger_path`
+    files written to that directory (the other function handlers otherwise).
+    """
+    from os.path import join
+
+    from aiohttp import web
+    from aiohttp_swagger import swagger_path
+
+    app = web.Application()
+    for i in range(routes):
+        kind = i % 5
+        url = "/resource_{}/{{id}}".format(i)
+        if kind == 3:
+            app.router.add_route("*", url, _make_view(i, parameters, groups))
+        elif kind == 4 and swagger_path_dir is not None:
+            path = join(swagger_path_dir, "route_{}.yaml".format(i))
+            with open(path, "w") as f:
+                f.write(make_fragment(i, parameters))
+            app.router.add_route(
+                "GET", url, swagger_path(path)(_make_handler(None)))
+        else:
+            app.router.add_route(
+                "GET", url, _make_handler(make_docstring(i, parameters,
+                                                         groups)))
+    return app
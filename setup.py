@@ -29,8 +29,10 @@
 # POSSIBILITY OF SUCH DAMAGE.
 #
 
+import importlib.util
 from os.path import dirname, join
-from setuptools import setup, find_packages
+from setuptools import Command, setup, find_packages
+from setuptools.command.build_py import build_py
 from setuptools.command.test import test as TestCommand
 
 
@@ -53,6 +55,42 @@ class PyTest(TestCommand):
         errno = subprocess.call([sys.executable, '-m', 'pytest', 'tests'])
         raise SystemExit(errno)
 
+
+def compress_swagger_ui(package_dir):
+    # Load the module by path: the package itself imports aiohttp, which may
+    # not be available at build time
+    spec = importlib.util.spec_from_file_location(
+        "compression",
+        join(dirname(__file__), "aiohttp_swagger", "helpers",
+             "compression.py"))
+    compression = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(compression)
+
+    for ui in ("swagger_ui", "swagger_ui3"):
+        compression.compress_static_files(join(package_dir, ui))
+
+
+class BuildPy(build_py):
+    def run(self):
+        super().run()
+        if not self.dry_run:
+            compress_swagger_ui(join(self.build_lib, "aiohttp_swagger"))
+
+
+class Precompress(Command):
+    description = "write .gz/.br siblings of the Swagger UI assets in place"
+    user_options = []
+
+    def initialize_options(self):
+        pass
+
+    def finalize_options(self):
+        pass
+
+    def run(self):
+        compress_swagger_ui(join(dirname(__file__), "aiohttp_swagger"))
+
+
 setup(
     name='aiohttp-swagger',
     version='1.0.16',
@@ -84,5 +122,5 @@ setup(
         'Topic :: Security',
     ],
     tests_require=['pytest', 'pytest-aiohttp'],
-    cmdclass=dict(test=PyTest)
+    cmdclass=dict(test=PyTest, build_py=BuildPy, precompress=Precompress)
 )
@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp_swagger import *
+from aiohttp_swagger.helpers import AdmissionControl
+
+from .test_swagger import ping
+
+
+def _app(loop, admission, **kwargs):
+    app = web.Application(loop=loop)
+    app.router.add_route('GET', "/ping", ping)
+    setup_swagger(app, admission=admission, **kwargs)
+    return app
+
+
+class _Clock(object):
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def test_rate_limit(aiohttp_client, loop):
+    clock = _Clock()
+    admission = AdmissionControl(rate=0.5, burst=2, client_header="X-Client",
+                                 clock=clock)
+    client = await aiohttp_client(_app(loop, admission))
+
+    for _ in range(2):
+        resp = await client.get('/api/doc/swagger.json',
+                                headers={"X-Client": "a"})
+        assert resp.status == 200
+    resp = await client.get('/api/doc/swagger.json',
+                            headers={"X-Client": "a"})
+    assert resp.status == 429
+    assert resp.headers["Retry-After"] == "2"
+    # The page and the assets count too
+    resp = await client.get('/api/doc', headers={"X-Client": "a"})
+    assert resp.status == 429
+    resp = await client.get('/api/doc/swagger_static/index.html',
+                            headers={"X-Client": "a"})
+    assert resp.status == 429
+
+    # Other clients have their own bucket
+    resp = await client.get('/api/doc/swagger.json',
+                            headers={"X-Client": "b, 10.0.0.1"})
+    assert resp.status == 200
+
+    clock.now = 2.0
+    resp = await client.get('/api/doc/swagger.json',
+                            headers={"X-Client": "a"})
+    assert resp.status == 200
+
+    # The API itself is not limited
+    resp = await client.get('/ping', headers={"X-Client": "a"})
+    assert resp.status == 200
+
+    assert admission.stats() == {
+        "admitted": 4, "queued": 0, "rate_limited": 3, "rejected": 0,
+        "timed_out": 0, "in_flight": 0, "waiting": 0, "clients": 2}
+
+
+@pytest.mark.parametrize("rate", [0, -1])
+def test_invalid_rate(rate):
+    with pytest.raises(ValueError):
+        AdmissionControl(rate=rate)
+
+
+def test_clients_bounded():
+    admission = AdmissionControl(rate=1, max_clients=3)
+    for client in range(10):
+        admission._take_token(str(client))
+    assert list(admission._buckets) == ["7", "8", "9"]
+
+
+async def test_max_in_flight(aiohttp_client, loop):
+    release = asyncio.Event()
+
+    def slow(handler):
+        async def _handler(request):
+            await release.wait()
+            return await handler(request)
+        return _handler
+
+    admission = AdmissionControl(max_in_flight=1, max_queue=1,
+                                 retry_after=5)
+    client = await aiohttp_client(_app(loop, admission,
+                                       swagger_def_decor=slow))
+
+    first = loop.create_task(client.get('/api/doc/swagger.json'))
+    second = loop.create_task(client.get('/api/doc/swagger.json'))
+    while admission.stats()["waiting"] < 1:
+        await asyncio.sleep(0.01)
+    assert admission.stats()["in_flight"] == 1
+
+    # Nothing more can wait
+    resp = await client.get('/api/doc')
+    assert resp.status == 503
+    assert resp.headers["Retry-After"] == "5"
+
+    release.set()
+    for task in (first, second):
+        resp = await task
+        assert resp.status == 200
+        assert "paths" in await resp.json()
+    assert admission.stats() == {
+        "admitted": 2, "queued": 1, "rate_limited": 0, "rejected": 1,
+        "timed_out": 0, "in_flight": 0, "waiting": 0, "clients": 0}
+
+
+async def test_queue_timeout(aiohttp_client, loop):
+    release = asyncio.Event()
+
+    def slow(handler):
+        async def _handler(request):
+            await release.wait()
+            return await handler(request)
+        return _handler
+
+    admission = AdmissionControl(max_in_flight=1, max_queue=10,
+                                 queue_timeout=0.05)
+    client = await aiohttp_client(_app(loop, admission,
+                                       swagger_home_decor=slow))
+
+    first = loop.create_task(client.get('/api/doc'))
+    while admission.stats()["in_flight"] < 1:
+        await asyncio.sleep(0.01)
+    resp = await client.get('/api/doc/swagger.json')
+    assert resp.status == 503
+    assert admission.stats()["timed_out"] == 1
+    assert admission.stats()["waiting"] == 0
+
+    release.set()
+    assert (await first).status == 200
+    resp = await client.get('/api/doc/swagger.json')
+    assert resp.status == 200
+    assert admission.stats()["in_flight"] == 0
+
+
+async def test_files_held(aiohttp_client, loop, tmpdir):
+    # Sent by the handler: sendfile and Range requests still work
+    admission = AdmissionControl(max_in_flight=1)
+    client = await aiohttp_client(_app(
+        loop, admission,
+        swagger_def_sendfile_path=str(tmpdir.join("swagger.json"))))
+
+    for _ in range(3):
+        resp = await client.get('/api/doc/swagger.json')
+        assert resp.status == 200
+        body = await resp.read()
+        assert body == tmpdir.join("swagger.json").read_binary()
+    resp = await client.get('/api/doc/swagger.json',
+                            headers={"Range": "bytes=0-3"})
+    assert resp.status == 206
+    assert await resp.read() == body[:4]
+    resp = await client.get('/api/doc/swagger_static/index.html')
+    assert resp.status == 200
+    resp = await client.get('/api/doc/swagger_static/missing.js')
+    assert resp.status == 404
+    assert admission.stats()["in_flight"] == 0
@@ -0,0 +1,95 @@
+import gzip
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp_swagger import *
+from aiohttp_swagger.__main__ import main
+from aiohttp_swagger.helpers.artifact import load_artifact, write_artifact
+
+from .test_swagger import ClassView, ping
+
+
+def app_factory():
+    app = web.Application()
+    app.router.add_route('GET', "/ping", ping)
+    app.router.add_route('*', "/class_view", ClassView)
+    return app
+
+
+async def async_app_factory():
+    app = app_factory()
+    setup_swagger(app, title="Factory Title")
+    return app
+
+
+def test_write_and_load_artifact(tmpdir):
+    path = str(tmpdir.join("dist", "swagger.json"))
+    digest = write_artifact('{"swagger": "2.0"}', path, encodings=("gzip",))
+
+    assert tmpdir.join("dist", "swagger.json.sha256").read() == \
+        "{}  swagger.json\n".format(digest)
+    body = load_artifact(path)
+    assert body.body == b'{"swagger": "2.0"}'
+    assert body.etag == '"{}"'.format(digest[:32])
+    assert gzip.decompress(body.variants["gzip"].body) == body.body
+
+    tmpdir.join("dist", "swagger.json").write('{"swagger": "3.0"}')
+    with pytest.raises(ValueError):
+        load_artifact(path)
+
+
+@pytest.mark.parametrize("target, title", [
+    ("tests.test_artifact:app_factory", "Swagger API"),
+    ("tests.test_artifact:async_app_factory", "Factory Title"),
+])
+def test_build_command(tmpdir, target, title):
+    output = str(tmpdir.join("swagger.json"))
+    main(["build", target, "-o", output])
+
+    with open(output) as f:
+        result = json.load(f)
+    assert result["info"]["title"] == title
+    assert sorted(result["paths"]) == ["/class_view", "/ping"]
+    assert tmpdir.join("swagger.json.gz").check()
+
+
+async def test_swagger_from_artifact(aiohttp_client, loop, tmpdir):
+    output = str(tmpdir.join("swagger.json"))
+    main(["build", "tests.test_artifact:app_factory", "-o", output])
+
+    app = web.Application(loop=loop)
+    setup_swagger(app, swagger_from_artifact=output)
+
+    client = await aiohttp_client(app, auto_decompress=False)
+    resp = await client.get('/api/doc/swagger.json',
+                            headers={"Accept-Encoding": "gzip"})
+    assert resp.status == 200
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert resp.headers["Vary"] == "Accept-Encoding"
+    result = json.loads(gzip.decompress(await resp.read()))
+    assert sorted(result["paths"]) == ["/class_view", "/ping"]
+
+    resp2 = await client.get('/api/doc/swagger.json',
+                             headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in resp2.headers
+    assert resp2.headers["ETag"] != resp.headers["ETag"]
+
+    resp3 = await client.get('/api/doc/swagger.json',
+                             headers={"Accept-Encoding": "gzip",
+                                      "If-None-Match": resp.headers["ETag"]})
+    assert resp3.status == 304
+
+
+@pytest.mark.parametrize("build", ["lazy", "background"])
+async def test_artifact_not_rebuilt(aiohttp_client, loop, tmpdir, build):
+    output = str(tmpdir.join("swagger.json"))
+    write_artifact('{"swagger": "2.0", "paths": {"/artifact": {}}}', output)
+
+    app = web.Application(loop=loop)
+    app.router.add_route('GET', "/ping", ping)
+    setup_swagger(app, swagger_from_artifact=output, build=build)
+
+    client = await aiohttp_client(app)
+    resp = await client.get('/api/doc/swagger.json')
+    assert list((await resp.json())["paths"]) == ["/artifact"]
@@ -0,0 +1,200 @@
+import json
+import subprocess
+import sys
+from os.path import join
+
+import pytest
+from aiohttp import web
+from aiohttp_swagger import *
+from aiohttp_swagger.helpers import (build_swagger_index,
+                                     generate_doc_from_each_end_point)
+from aiohttp_swagger.helpers.builders import SWAGGER_TEMPLATE
+
+from .test_swagger import ClassView, ping, ping_partial
+
+
+async def invalid_doc(request):
+    """
+    ---
+    description: [unclosed
+    """
+    return web.Response(text="pong")
+
+
+@swagger_path("/does/not/exist.yaml")
+async def missing_file(request):
+    return web.Response(text="pong")
+
+
+def _app():
+    app = web.Application()
+    app.router.add_route('GET', "/ping", ping)
+    app.router.add_route('*', "/class_view", ClassView)
+    app.router.add_route('GET', "/ping-partial", ping_partial)
+    app.router.add_route('GET', "/invalid", invalid_doc)
+    app.router.add_route('GET', "/missing", missing_file)
+    for i in range(20):
+        app.router.add_route('POST', "/ping/{}".format(i), ping)
+    return app
+
+
+def test_parallel_parse_matches_serial():
+    app = _app()
+    serial = generate_doc_from_each_end_point(app)
+    parallel = generate_doc_from_each_end_point(
+        app, parse_workers=2, parallel_threshold=1)
+    assert parallel == serial
+
+    paths = json.loads(parallel)["paths"]
+    assert paths["/invalid"]["get"]["tags"] == ["Invalid Swagger"]
+    assert paths["/missing"]["get"]["tags"] == ["Invalid Swagger"]
+    assert sorted(paths["/class_view"]) == ["get", "post"]
+
+
+def test_parallel_parse_in_a_thread():
+    # As with build="lazy" or "background"
+    from concurrent.futures import ThreadPoolExecutor
+
+    app = _app()
+    serial = generate_doc_from_each_end_point(app)
+    with ThreadPoolExecutor(1) as executor:
+        parallel = executor.submit(
+            generate_doc_from_each_end_point, app, parse_workers=2,
+            parallel_threshold=1).result()
+    assert parallel == serial
+
+
+async def mixed_responses(request):
+    """
+    ---
+    description: Unquoted status codes next to "default"
+    responses:
+        200:
+            description: successful operation
+        default:
+            description: unexpected error
+    """
+    return web.Response(text="pong")
+
+
+def test_mixed_response_keys():
+    app = web.Application()
+    app.router.add_route('GET', "/mixed", mixed_responses)
+    result = json.loads(generate_doc_from_each_end_point(app))
+    assert sorted(result["paths"]["/mixed"]["get"]["responses"]) == \
+        ["200", "default"]
+
+
+class _Router(object):
+    def __init__(self, routes):
+        self._routes = routes
+
+    def routes(self):
+        return list(self._routes)
+
+
+class _App(object):
+    def __init__(self, routes):
+        self.router = _Router(routes)
+
+
+def test_swagger_index_refresh():
+    app = _app()
+    index = build_swagger_index(app)
+    assert index.refresh() == set()
+
+    app.router.add_route('GET', "/added", ping)
+    app.router.add_route('POST', "/ping", ping)
+    assert index.refresh() == {"/added", "/ping"}
+    # Same bytes as a full build
+    assert index.dumps() == generate_doc_from_each_end_point(app)
+
+    # Removed routes
+    routes = list(app.router.routes())
+    stub = _App(routes)
+    index = build_swagger_index(stub)
+    stub.router._routes = [route for route in routes
+                           if route.resource.canonical != "/ping"]
+    assert index.refresh() == {"/ping"}
+    assert "/ping" not in json.loads(index.dumps())["paths"]
+    assert index.dumps() == generate_doc_from_each_end_point(stub)
+
+
+async def test_refresh_swagger(aiohttp_client, loop):
+    app = web.Application(loop=loop)
+    app.router.add_route('GET', "/ping", ping)
+    setup_swagger(app)
+    etag = app["SWAGGER_DEF"].body.etag
+
+    app.router.add_route('*', "/class_view", ClassView)
+    assert refresh_swagger(app)
+    assert not refresh_swagger(app)
+    assert app["SWAGGER_DEF"].body.etag != etag
+    assert "/class_view" in json.loads(app["SWAGGER_DEF_CONTENT"])["paths"]
+
+    client = await aiohttp_client(app)
+    resp = await client.get('/api/doc/swagger.json')
+    result = await resp.json()
+    assert sorted(result['paths']) == ["/class_view", "/ping"]
+
+
+async def test_refresh_on_startup(aiohttp_client, loop):
+    app = web.Application(loop=loop)
+    app.router.add_route('GET', "/ping", ping)
+    setup_swagger(app, refresh_on_startup=True)
+    app.router.add_route('*', "/class_view", ClassView)
+
+    client = await aiohttp_client(app)
+    resp = await client.get('/api/doc/swagger.json')
+    result = await resp.json()
+    assert sorted(result['paths']) == ["/class_view", "/ping"]
+
+
+@pytest.mark.parametrize("ui_version, template", [
+    (2, "swagger.yaml"), (3, "openapi.yaml")])
+def test_native_base_matches_template(ui_version, template):
+    app = web.Application()
+    app.router.add_route('GET', "/ping", ping)
+    options = dict(
+        ui_version=ui_version, api_base_url="/api", title="API Title",
+        description="\nMulti-line\ndescription", api_version="2.1.0",
+        contact="Jane Doe", definitions={"User": {
+            "type": "object",
+            "properties": {"name": {"type": "string"}}}},
+        security_definitions={"key": {
+            "type": "apiKey", "name": "X-Key", "in": "header"}})
+
+    native = generate_doc_from_each_end_point(app, **options)
+    rendered = generate_doc_from_each_end_point(
+        app, template_path=join(SWAGGER_TEMPLATE, template), **options)
+    assert native == rendered
+
+
+def test_native_base_keeps_definitions():
+    definitions = {"Model": {
+        "type": "object",
+        "required": ["name", "id"],
+        "properties": {
+            "name": {"type": "string", "example": 'say "hi": now'},
+            "flag": {"type": "boolean", "default": False},
+            "nothing": {"default": None},
+        },
+    }}
+    result = json.loads(generate_doc_from_each_end_point(
+        web.Application(), definitions=definitions))
+    assert result["definitions"] == definitions
+
+
+def test_jinja2_only_imported_for_custom_templates():
+    code = (
+        "import sys\n"
+        "from aiohttp import web\n"
+        "from aiohttp_swagger import setup_swagger\n"
+        "setup_swagger(web.Application(), ui_version={})\n"
+        "print('jinja2' in sys.modules)\n"
+    )
+    for ui_version in (2, 3):
+        output = subprocess.run(
+            [sys.executable, "-c", code.format(ui_version)], check=True,
+            stdout=subprocess.PIPE).stdout
+        assert output.strip() == b"False"
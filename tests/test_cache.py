@@ -0,0 +1,107 @@
+import os
+
+import pytest
+from aiohttp import web
+from aiohttp_swagger.helpers import builders
+from aiohttp_swagger.helpers import generate_doc_from_each_end_point
+from aiohttp_swagger.helpers.cache import DocstringCache, SwaggerFileCache
+from aiohttp_swagger.helpers.yaml_loader import load_yaml
+
+from .test_swagger import ClassView, ping, ping_partial
+
+
+def test_docstring_cache(tmpdir):
+    cache = DocstringCache(str(tmpdir))
+    key = cache.text_key("description: ping")
+    assert cache.get(key) is None
+
+    assert cache.load(key, lambda: {"description": "ping"}) == \
+        {"description": "ping"}
+    assert cache.load(key, lambda: 1 / 0) == {"description": "ping"}
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    # A damaged entry is a miss, not an error
+    with open(cache._path(key), "wb") as f:
+        f.write(b"garbage")
+    assert cache.load(key, lambda: "reparsed") == "reparsed"
+
+
+def test_docstring_cache_private(tmpdir):
+    directory = tmpdir.join("cache")
+    DocstringCache(str(directory))
+    assert directory.stat().mode & 0o077 == 0
+
+    # Anyone able to write there could run code in the workers
+    shared = tmpdir.mkdir("shared")
+    shared.chmod(0o777)
+    with pytest.raises(ValueError):
+        DocstringCache(str(shared))
+
+
+def test_docstring_cache_prune(tmpdir):
+    cache = DocstringCache(str(tmpdir), max_size=2500)
+    keys = [cache.text_key(str(i)) for i in range(5)]
+    for i, key in enumerate(keys):
+        cache.set(key, "x" * 1000)
+        os.utime(cache._path(key), (i, i))
+
+    assert cache.prune() == 3
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[4]) == "x" * 1000
+
+
+def test_generate_with_yaml_cache(tmpdir, monkeypatch):
+    def _build():
+        app = web.Application()
+        app.router.add_route('GET', "/ping", ping)
+        app.router.add_route('*', "/class_view", ClassView)
+        app.router.add_route('GET', "/ping-partial", ping_partial)
+        return generate_doc_from_each_end_point(
+            app, yaml_cache_dir=str(tmpdir))
+
+    cold = _build()
+
+    parsed = []
+    load_yaml = builders.load_yaml
+
+    def _counting_load_yaml(stream):
+        parsed.append(stream)
+        return load_yaml(stream)
+
+    monkeypatch.setattr(builders, "load_yaml", _counting_load_yaml)
+    assert _build() == cold
+    # Nothing is parsed on a warm start
+    assert parsed == []
+
+
+def test_swagger_file_cache(tmpdir):
+    path = tmpdir.join("partial.yaml")
+    path.write("description: first\n")
+    cache = SwaggerFileCache()
+    parse = lambda: load_yaml(path.read())  # noqa: E731
+
+    first = cache.load(str(path), parse)
+    assert cache.load(str(path), parse) == first
+    assert (cache.reads, cache.reads_saved) == (1, 1)
+
+    # Each caller owns its copy
+    first["description"] = "modified"
+    assert cache.load(str(path), parse) == {"description": "first"}
+
+    path.write("description: second version\n")
+    assert cache.load(str(path), parse) == {"description": "second version"}
+    assert cache.reads == 2
+
+
+def test_swagger_file_shared_between_routes(monkeypatch):
+    cache = SwaggerFileCache()
+    monkeypatch.setattr(builders, "swagger_file_cache", cache)
+
+    app = web.Application()
+    for i in range(10):
+        # add_get also registers a HEAD route for the same handler
+        app.router.add_get("/ping-partial/{}".format(i), ping_partial)
+    generate_doc_from_each_end_point(app)
+
+    assert cache.reads == 1
+    assert cache.reads_saved == 19
@@ -0,0 +1,234 @@
+import gzip
+import json
+import os
+import re
+
+import pytest
+from aiohttp import web
+from aiohttp_swagger import *
+from aiohttp_swagger.helpers.compression import (available_encodings,
+                                                 compress_static_files,
+                                                 decompress,
+                                                 find_static_files,
+                                                 select_encoding)
+from aiohttp_swagger.helpers.mounts import SwaggerStatic
+from aiohttp_swagger.helpers.responses import CompressedBody
+
+from .test_swagger import ClassView, ping
+
+
+@pytest.mark.parametrize("accept, available, expected", [
+    ("", ("br", "gzip"), None),
+    ("gzip, deflate, br", ("br", "gzip"), "br"),
+    ("gzip, deflate, br", ("gzip",), "gzip"),
+    ("gzip;q=1.0, br;q=0.5", ("br", "gzip"), "gzip"),
+    ("br;q=0, gzip;q=0", ("br", "gzip"), None),
+    ("*", ("gzip",), "gzip"),
+    ("*;q=0, identity", ("br", "gzip"), None),
+    ("deflate", ("br", "gzip"), None),
+])
+def test_select_encoding(accept, available, expected):
+    assert select_encoding(accept, available) == expected
+
+
+def test_compress_static_files(tmpdir):
+    tmpdir.join("bundle.js").write("var a = 1;\n" * 1000)
+    tmpdir.join("tiny.css").write("a{}")
+    tmpdir.join("logo.png").write_binary(b"\x89PNG" * 100)
+
+    written = compress_static_files(str(tmpdir), encodings=("gzip",))
+    assert written == 1
+    assert tmpdir.join("bundle.js.gz").check()
+    assert not tmpdir.join("tiny.css.gz").check()
+    assert not tmpdir.join("logo.png.gz").check()
+
+    # Up to date siblings are not rewritten
+    assert compress_static_files(str(tmpdir), encodings=("gzip",)) == 0
+
+    assert find_static_files(str(tmpdir)) == {
+        "bundle.js": ("gzip",),
+        "tiny.css": (),
+        "logo.png": (),
+    }
+
+
+async def test_static_identity(aiohttp_client, loop):
+    app = web.Application(loop=loop)
+    setup_swagger(app, ui_version=3)
+
+    client = await aiohttp_client(app)
+    resp = await client.get('/api/doc/swagger_static/swagger-ui.css',
+                            headers={"Accept-Encoding": "gzip, br"})
+    assert resp.status == 200
+    assert resp.headers["Content-Type"].startswith("text/css")
+    assert "Content-Encoding" not in resp.headers
+
+    resp = await client.get('/api/doc/swagger_static/../../__init__.py')
+    assert resp.status == 404
+    resp = await client.get('/api/doc/swagger_static/missing.js')
+    assert resp.status == 404
+
+
+async def test_static_precompressed(aiohttp_client, loop, tmpdir):
+    content = "var a = 1;\n" * 1000
+    tmpdir.join("bundle.js").write(content)
+    compress_static_files(str(tmpdir), encodings=("gzip",))
+
+    app = web.Application(loop=loop)
+    setup_swagger(app, ui_version=3)
+    static = app["SWAGGER_MOUNTS"]["/api/doc"].static
+    static.path = str(tmpdir)
+    static.files = find_static_files(str(tmpdir))
+
+    client = await aiohttp_client(app, auto_decompress=False)
+    resp = await client.get('/api/doc/swagger_static/bundle.js',
+                            headers={"Accept-Encoding": "gzip"})
+    assert resp.status == 200
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert resp.headers["Vary"] == "Accept-Encoding"
+    assert "javascript" in resp.headers["Content-Type"]
+    body = await resp.read()
+    assert gzip.decompress(body).decode() == content
+
+    resp = await client.get('/api/doc/swagger_static/bundle.js',
+                            headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in resp.headers
+    assert resp.headers["Vary"] == "Accept-Encoding"
+    assert (await resp.read()).decode() == content
+
+
+def _compressed_app(loop, **kwargs):
+    app = web.Application(loop=loop)
+    app.router.add_route('GET', "/ping", ping)
+    app.router.add_route('*', "/class_view", ClassView)
+    setup_swagger(app, swagger_def_compress=True, **kwargs)
+    app["SWAGGER_DEF"].compression.result()
+    return app
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"swagger_def_compressed_only": True}])
+async def test_swagger_def_precompressed(aiohttp_client, loop, kwargs):
+    app = _compressed_app(loop, **kwargs)
+    body = app["SWAGGER_DEF"].body
+    assert sorted(body.variants) == sorted(available_encodings())
+    assert isinstance(body, CompressedBody) == bool(kwargs)
+    identity = body.body
+
+    client = await aiohttp_client(app, auto_decompress=False)
+    for encoding in available_encodings():
+        resp = await client.get('/api/doc/swagger.json',
+                                headers={"Accept-Encoding": encoding})
+        assert resp.headers["Content-Encoding"] == encoding
+        assert resp.headers["Vary"] == "Accept-Encoding"
+        assert resp.headers["ETag"] == '{}-{}"'.format(body.etag[:-1],
+                                                       encoding)
+        assert decompress(await resp.read(), encoding) == identity
+
+        resp = await client.get('/api/doc/swagger.json', headers={
+            "Accept-Encoding": encoding,
+            "If-None-Match": resp.headers["ETag"]})
+        assert resp.status == 304
+
+    resp = await client.get('/api/doc/swagger.json',
+                            headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in resp.headers
+    assert resp.headers["Vary"] == "Accept-Encoding"
+    assert resp.headers["ETag"] == body.etag
+    assert await resp.read() == identity
+    assert sorted(json.loads(identity)["paths"]) == ["/class_view", "/ping"]
+
+
+def test_swagger_def_precompressed_refresh():
+    app = web.Application()
+    app.router.add_route('GET', "/ping", ping)
+    setup_swagger(app, swagger_def_compress=True)
+    first = app["SWAGGER_DEF"].compression
+
+    app.router.add_route('*', "/class_view", ClassView)
+    assert refresh_swagger(app)
+    # The outdated compression never replaces the refreshed body
+    first.result()
+    compressed = app["SWAGGER_DEF"].compression.result()
+    assert app["SWAGGER_DEF"].body is compressed
+    assert "/class_view" in json.loads(
+        gzip.decompress(compressed.variants["gzip"].body))["paths"]
+
+
+async def test_swagger_def_precompressed_sendfile(aiohttp_client, loop,
+                                                  tmpdir):
+    path = str(tmpdir.join("swagger.json"))
+    app = _compressed_app(loop, swagger_def_sendfile_path=path)
+    assert sorted(os.listdir(str(tmpdir))) == sorted(
+        ["swagger.json"] + ["swagger.json." + encoding
+                            for encoding in available_encodings()])
+
+    client = await aiohttp_client(app, auto_decompress=False)
+    resp = await client.get('/api/doc/swagger.json',
+                            headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert resp.headers["ETag"].endswith('-gzip"')
+    assert gzip.decompress(await resp.read()) == \
+        tmpdir.join("swagger.json").read_binary()
+
+
+def test_swagger_def_compress_not_streamed():
+    with pytest.raises(ValueError):
+        setup_swagger(web.Application(), swagger_def_compress=True,
+                      swagger_def_stream=True)
+
+
+async def test_static_in_memory(aiohttp_client, loop, tmpdir):
+    app = web.Application(loop=loop)
+    setup_swagger(app, ui_version=3, static_in_memory=True,
+                  static_fingerprint=True)
+    static = app["SWAGGER_MOUNTS"]["/api/doc"].static
+    with open(os.path.join(static.path, "swagger-ui.css"), "rb") as f:
+        css = f.read()
+    assert static.memory == sum(
+        os.path.getsize(os.path.join(static.path, name))
+        for name in os.listdir(static.path) if not name.endswith(".map"))
+    client = await aiohttp_client(app)
+
+    # Left out of memory, still served from disk
+    resp = await client.get('/api/doc/swagger_static/swagger-ui.css.map')
+    assert resp.status == 200
+    with open(os.path.join(static.path, "swagger-ui.css.map"), "rb") as f:
+        assert await resp.read() == f.read()
+
+    # Served without touching the files
+    static.path = str(tmpdir.join("missing"))
+
+    resp = await client.get('/api/doc/swagger_static/swagger-ui.css')
+    assert resp.status == 200
+    assert resp.headers["Content-Type"] == "text/css"
+    assert "Cache-Control" not in resp.headers
+    assert await resp.read() == css
+
+    resp = await client.get('/api/doc/swagger_static/swagger-ui.css',
+                            headers={"If-None-Match": resp.headers["ETag"]})
+    assert resp.status == 304
+
+    resp = await client.get('/api/doc/swagger_static/missing.css')
+    assert resp.status == 404
+
+    html = await (await client.get('/api/doc')).text()
+    bundle = re.search(
+        r'/api/doc/swagger_static/(swagger-ui-bundle\.[0-9a-f]{12}\.js)',
+        html).group(1)
+    resp = await client.get('/api/doc/swagger_static/' + bundle)
+    assert resp.status == 200
+    assert resp.headers["Cache-Control"] == \
+        "public, max-age=31536000, immutable"
+
+
+def test_static_in_memory_precompressed(tmpdir):
+    tmpdir.join("bundle.js").write("var a = 1;\n" * 1000)
+    tmpdir.join("bundle.js.map").write("{}")
+    compress_static_files(str(tmpdir), encodings=("gzip",))
+
+    static = SwaggerStatic(str(tmpdir), "/static")
+    static.load()
+    assert sorted(static.bodies) == ["bundle.js"]
+    body = static.bodies["bundle.js"]
+    assert gzip.decompress(body.variants["gzip"].body) == body.body
+    assert static.memory == len(body.body) + len(body.variants["gzip"].body)
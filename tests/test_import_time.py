@@ -0,0 +1,52 @@
+import subprocess
+import sys
+
+import pytest
+
+# Import time of aiohttp_swagger on top of aiohttp.web, in microseconds.
+# About 10 ms when this test was written: the budget only catches a heavy
+# dependency imported again at module load.
+IMPORT_BUDGET_US = 100000
+
+# Only imported on the code paths that need them
+LAZY_MODULES = ("yaml", "jinja2", "ujson", "multiprocessing",
+                "concurrent.futures.process")
+
+
+def _import_times():
+    """
+    The modules imported by `import aiohttp_swagger` after aiohttp.web, as
+    {module: cumulative microseconds}
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         "import aiohttp.web; import aiohttp_swagger"],
+        check=True, stderr=subprocess.PIPE).stderr.decode()
+
+    times = {}
+    after_aiohttp = False
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        module = module.strip()
+        if module == "aiohttp.web":
+            after_aiohttp = True
+        elif after_aiohttp:
+            times[module] = int(cumulative)
+    return times
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7),
+                    reason="-X importtime needs 3.7")
+def test_import_time():
+    times = _import_times()
+    assert "aiohttp_swagger" in times
+
+    imported = [module for module in times
+                if any(module == lazy or module.startswith(lazy + ".")
+                       for lazy in LAZY_MODULES)]
+    assert imported == []
+    assert times["aiohttp_swagger"] < IMPORT_BUDGET_US
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp_swagger import *
+
+from .test_swagger import ping
+from .test_validation import search_users
+
+
+def _app(loop):
+    app = web.Application(loop=loop)
+    app.router.add_route('GET', "/v1/ping", ping)
+    app.router.add_route('GET', "/v2/ping", ping)
+    app.router.add_route('GET', "/v10/ping", ping)
+    setup_swagger(app, swagger_url="/api/v1/doc", route_prefix="/v1",
+                  title="v1")
+    setup_swagger(app, swagger_url="/api/v2/doc", route_prefix="/v2/",
+                  title="v2")
+    return app
+
+
+async def test_several_mounts(aiohttp_client, loop):
+    app = _app(loop)
+    client = await aiohttp_client(app)
+
+    resp_1 = await client.get('/api/v1/doc/swagger.json')
+    resp_2 = await client.get('/api/v2/doc/swagger.json')
+    result_1, result_2 = await resp_1.json(), await resp_2.json()
+    assert result_1["info"]["title"] == "v1"
+    assert list(result_1["paths"]) == ["/v1/ping"]
+    assert result_2["info"]["title"] == "v2"
+    assert list(result_2["paths"]) == ["/v2/ping"]
+    assert resp_1.headers["ETag"] != resp_2.headers["ETag"]
+
+    # The keys of a single mount still hold the first one
+    assert app["SWAGGER_DEF"] is app["SWAGGER_MOUNTS"]["/api/v1/doc"].definition
+    assert '"v1"' in app["SWAGGER_DEF_CONTENT"]
+
+    # One asset tree, served once for both pages
+    assert len(app["SWAGGER_STATICS"]) == 1
+    for url in ('/api/v1/doc', '/api/v2/doc'):
+        resp = await client.get(url)
+        text = await resp.text()
+        assert "{}/swagger.json".format(url) in text
+        assert "/api/v1/doc/swagger_static" in text
+    resp = await client.get('/api/v1/doc/swagger_static/index.html')
+    assert resp.status == 200
+    resp = await client.get('/api/v2/doc/swagger_static/index.html')
+    assert resp.status == 404
+
+
+async def test_mounts_of_each_ui_version(aiohttp_client, loop):
+    app = web.Application(loop=loop)
+    app.router.add_route('GET', "/ping", ping)
+    setup_swagger(app, swagger_url="/api/doc")
+    setup_swagger(app, swagger_url="/api/doc3", ui_version=3)
+    assert len(app["SWAGGER_STATICS"]) == 2
+
+    client = await aiohttp_client(app)
+    resp = await client.get('/api/doc3/swagger.json')
+    assert (await resp.json())["openapi"] == "3.0.1"
+    resp = await client.get('/api/doc3')
+    assert "/api/doc3/swagger_static" in await resp.text()
+
+
+def test_refresh_every_mount(loop):
+    app = _app(loop)
+    app.router.add_route('GET', "/v2/pong", ping)
+    assert refresh_swagger(app)
+    mounts = app["SWAGGER_MOUNTS"]
+    assert "/v2/pong" in json.loads(
+        mounts["/api/v2/doc"].definition.content)["paths"]
+    assert "/v2/pong" not in json.loads(
+        mounts["/api/v1/doc"].definition.content)["paths"]
+
+
+def test_mount_twice():
+    app = web.Application()
+    setup_swagger(app, swagger_url="/api/doc")
+    with pytest.raises(ValueError):
+        setup_swagger(app, swagger_url="/api/doc/")
+
+
+async def test_validate_every_mount(aiohttp_client, loop):
+    app = web.Application(loop=loop)
+    app.router.add_route('GET', "/v1/users", search_users)
+    app.router.add_route('GET', "/v2/users", search_users)
+    for version in ("v1", "v2"):
+        setup_swagger(app, swagger_url="/api/{}/doc".format(version),
+                      route_prefix="/" + version, validate_requests=True)
+    assert len(app.middlewares) == 1
+
+    client = await aiohttp_client(app)
+    for version in ("v1", "v2"):
+        resp = await client.get('/{}/users'.format(version))
+        assert resp.status == 400
+        resp = await client.get('/{}/users'.format(version),
+                                params={"sort": "age"})
+        assert (await resp.json())["limit"] == 10
@@ -0,0 +1,120 @@
+import gc
+import gzip
+import json
+import tracemalloc
+
+from aiohttp import web
+from aiohttp_swagger import *
+from aiohttp_swagger.helpers.artifact import write_artifact
+
+from .test_streaming import _large_app
+from .test_swagger import ClassView, ping
+
+
+def _app(loop, **kwargs):
+    app = web.Application(loop=loop)
+    app.router.add_route('GET', "/ping", ping)
+    app.router.add_route('*', "/class_view", ClassView)
+    setup_swagger(app, **kwargs)
+    return app
+
+
+async def test_sendfile_same_as_memory(aiohttp_client, loop, tmpdir):
+    path = str(tmpdir.join("swagger.json"))
+    memory = await aiohttp_client(_app(loop))
+    sendfile_app = _app(loop, swagger_def_sendfile_path=path)
+    sendfile = await aiohttp_client(sendfile_app)
+    # Only on disk
+    assert sendfile_app["SWAGGER_DEF_CONTENT"] is None
+
+    memory_resp = await memory.get('/api/doc/swagger.json')
+    resp = await sendfile.get('/api/doc/swagger.json')
+    assert resp.status == 200
+    body = await resp.read()
+    assert body == await memory_resp.read()
+    assert body == tmpdir.join("swagger.json").read_binary()
+    for header in ("ETag", "Content-Type", "Cache-Control", "Content-Length"):
+        assert resp.headers[header] == memory_resp.headers[header]
+    assert resp.headers["Accept-Ranges"] == "bytes"
+
+    resp = await sendfile.get('/api/doc/swagger.json', headers={
+        "If-None-Match": memory_resp.headers["ETag"]})
+    assert resp.status == 304
+    assert resp.headers["ETag"] == memory_resp.headers["ETag"]
+
+    resp = await sendfile.get('/api/doc/swagger.json', headers={
+        "If-Modified-Since": resp.headers["Last-Modified"]})
+    assert resp.status == 304
+
+    resp = await sendfile.get('/api/doc/swagger.json',
+                              headers={"Range": "bytes=10-19"})
+    assert resp.status == 206
+    assert await resp.read() == body[10:20]
+    assert resp.headers["Content-Range"] == "bytes 10-19/{}".format(len(body))
+
+    resp = await sendfile.head('/api/doc/swagger.json')
+    assert resp.status == 200
+    assert resp.headers["Content-Length"] == str(len(body))
+
+
+async def test_sendfile_encodings(aiohttp_client, loop, tmpdir):
+    artifact = str(tmpdir.join("dist", "swagger.json"))
+    write_artifact('{"swagger": "2.0", "paths": {}}', artifact,
+                   encodings=("gzip",))
+    path = str(tmpdir.join("swagger.json"))
+    client = await aiohttp_client(_app(
+        loop, swagger_from_artifact=artifact,
+        swagger_def_sendfile_path=path), auto_decompress=False)
+
+    resp = await client.get('/api/doc/swagger.json',
+                            headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert resp.headers["Vary"] == "Accept-Encoding"
+    assert resp.headers["ETag"].endswith('-gzip"')
+    assert json.loads(gzip.decompress(await resp.read())) == {
+        "swagger": "2.0", "paths": {}}
+
+    # A refused coding is never sent
+    resp = await client.get('/api/doc/swagger.json',
+                            headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in resp.headers
+    assert await resp.json() == {"swagger": "2.0", "paths": {}}
+
+
+def test_sendfile_refresh(tmpdir):
+    path = tmpdir.join("swagger.json")
+    app = web.Application()
+    app.router.add_route('GET', "/ping", ping)
+    setup_swagger(app, swagger_def_sendfile_path=str(path))
+    etag = app["SWAGGER_DEF"].body.etag
+
+    app.router.add_route('*', "/class_view", ClassView)
+    assert refresh_swagger(app)
+    assert app["SWAGGER_DEF"].body.etag != etag
+    assert sorted(json.loads(path.read())["paths"]) == [
+        "/class_view", "/ping"]
+    # Built again, as the index is not kept: the same routes, the same ETag
+    etag = app["SWAGGER_DEF"].body.etag
+    assert not refresh_swagger(app)
+    assert app["SWAGGER_DEF"].body.etag == etag
+
+
+def test_sendfile_memory(tmpdir):
+    # Imports and first-use caches are not part of the measure
+    _app(None, swagger_def_sendfile_path=str(tmpdir.join("warm.json")))
+
+    app = _large_app()
+    path = tmpdir.join("swagger.json")
+    tracemalloc.start()
+    try:
+        setup_swagger(app, swagger_def_sendfile_path=str(path))
+        gc.collect()
+        kept = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    size = path.size()
+    assert size > 2 * 1024 * 1024
+    # Neither the JSON nor the parsed operations stay in the worker
+    assert app["SWAGGER_DEF"].index is None
+    assert kept < size / 10
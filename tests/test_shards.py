@@ -0,0 +1,157 @@
+import json
+from os.path import abspath, dirname, join
+
+from aiohttp import web
+from aiohttp_swagger import *
+from aiohttp_swagger.helpers.shards import split_by_tag
+
+from .test_swagger import ClassView, ping, undoc_ping, users_with_data_def
+
+
+def _definitions():
+    with open(join(abspath(dirname(__file__)), "data",
+                   "example_data_definitions.json")) as f:
+        definitions = json.load(f)
+    definitions["Unused"] = {"type": "object"}
+    return definitions
+
+
+def test_split_by_tag_swagger2():
+    shards = split_by_tag({
+        "swagger": "2.0",
+        "info": {"title": "API"},
+        "tags": [{"name": "Users"}, {"name": "Health"}],
+        "paths": {
+            "/users": {
+                "parameters": [{"$ref": "#/parameters/Page"}],
+                "get": {"tags": ["Users"], "responses": {"200": {
+                    "schema": {"$ref": "#/definitions/User"}}}},
+                "post": {"tags": ["Users", "Admin"], "responses": {
+                    "201": {"$ref": "#/responses/Created"}}},
+            },
+            "/ping": {"get": {"responses": {"200": {}}}},
+        },
+        "definitions": {
+            "User": {"properties": {"group": {
+                "$ref": "#/definitions/Group"}}},
+            "Group": {"properties": {"owner": {
+                "$ref": "#/definitions/User"}}},
+            "Unused": {},
+        },
+        "parameters": {"Page": {"name": "page", "in": "query"}},
+        "responses": {"Created": {"schema": {
+            "$ref": "#/definitions/Group"}}},
+    })
+
+    assert sorted(shards) == ["Admin", "Users", "default"]
+
+    users = shards["Users"]
+    assert users["info"] == {"title": "API"}
+    assert users["tags"] == [{"name": "Users"}]
+    assert sorted(users["paths"]["/users"]) == ["get", "parameters", "post"]
+    assert sorted(users["definitions"]) == ["Group", "User"]
+    assert sorted(users["parameters"]) == ["Page"]
+    assert sorted(users["responses"]) == ["Created"]
+
+    admin = shards["Admin"]
+    assert "tags" not in admin
+    assert sorted(admin["paths"]["/users"]) == ["parameters", "post"]
+    assert sorted(admin["definitions"]) == ["Group", "User"]
+
+    default = shards["default"]
+    assert list(default["paths"]) == ["/ping"]
+    assert "definitions" not in default
+    assert "parameters" not in default
+
+
+def test_split_by_tag_openapi3():
+    shards = split_by_tag({
+        "openapi": "3.0.1",
+        "paths": {"/users": {"get": {"tags": ["Users"], "responses": {
+            "200": {"content": {"application/json": {"schema": {
+                "$ref": "#/components/schemas/User"}}}}}}}},
+        "components": {
+            "schemas": {
+                "User": {"properties": {"permissions": {"items": {
+                    "$ref": "#/components/schemas/Permission"}}}},
+                "Permission": {},
+                "Unused": {},
+            },
+            "securitySchemes": {"key": {"type": "apiKey"}},
+        },
+    })
+
+    assert sorted(shards["Users"]["components"]) == ["schemas",
+                                                     "securitySchemes"]
+    assert sorted(shards["Users"]["components"]["schemas"]) == [
+        "Permission", "User"]
+
+
+def _app(loop, **kwargs):
+    app = web.Application(loop=loop)
+    app.router.add_route('GET', "/ping", ping)
+    app.router.add_route('GET', "/undoc_ping", undoc_ping)
+    app.router.add_route('*', "/class_view", ClassView)
+    app.router.add_route('GET', "/users", users_with_data_def)
+    setup_swagger(app, definitions=_definitions(), tag_shards=True,
+                  **kwargs)
+    return app
+
+
+async def test_tag_shards(aiohttp_client, loop):
+    client = await aiohttp_client(_app(loop))
+
+    resp = await client.get('/api/doc/tags.json')
+    assert resp.status == 200
+    index = await resp.json()
+    assert [shard["name"] for shard in index["tags"]] == [
+        "Class View", "Health check", "Users"]
+    assert index["tags"][0]["url"] == "/api/doc/tags/Class%20View.json"
+    assert index["tags"][0]["operations"] == 2
+
+    resp = await client.get(index["tags"][2]["url"])
+    assert resp.status == 200
+    users = await resp.json()
+    assert list(users["paths"]) == ["/users"]
+    assert sorted(users["definitions"]) == ["Permission", "User"]
+
+    resp = await client.get('/api/doc/swagger.json', params={"tag": "Users"})
+    assert resp.status == 200
+    assert await resp.json() == users
+    etag = resp.headers["ETag"]
+
+    resp = await client.get('/api/doc/swagger.json')
+    assert resp.headers["ETag"] != etag
+    assert "Unused" in (await resp.json())["definitions"]
+
+    resp = await client.get('/api/doc/tags/Users.json',
+                            headers={"If-None-Match": etag})
+    assert resp.status == 304
+
+    resp = await client.get('/api/doc/tags/Nope.json')
+    assert resp.status == 404
+    resp = await client.get('/api/doc/swagger.json', params={"tag": "Nope"})
+    assert resp.status == 404
+
+
+async def test_tag_shards_lazy_build(aiohttp_client, loop):
+    app = _app(loop, build="lazy")
+    client = await aiohttp_client(app)
+    assert app["SWAGGER_DEF"].shards is None
+
+    resp = await client.get('/api/doc/tags/Health%20check.json')
+    assert resp.status == 200
+    assert list((await resp.json())["paths"]) == ["/ping"]
+
+
+async def test_tag_shards_disabled(aiohttp_client, loop):
+    app = web.Application(loop=loop)
+    app.router.add_route('GET', "/ping", ping)
+    setup_swagger(app)
+    client = await aiohttp_client(app)
+
+    resp = await client.get('/api/doc/tags.json')
+    assert resp.status == 404
+    resp = await client.get('/api/doc/swagger.json', params={"tag": "Users"})
+    assert resp.status == 200
+    assert "/ping" in (await resp.json())["paths"]
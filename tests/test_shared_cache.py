@@ -0,0 +1,127 @@
+import json
+import multiprocessing
+import os
+
+import pytest
+from aiohttp import web
+from aiohttp_swagger import *
+from aiohttp_swagger.helpers import SwaggerTimings, fingerprint_routes
+from aiohttp_swagger.helpers.artifact import SharedArtifactCache
+
+from .test_swagger import ClassView, ping
+
+
+def _app():
+    app = web.Application()
+    app.router.add_route('GET', "/ping", ping)
+    app.router.add_route('*', "/class_view", ClassView)
+    return app
+
+
+def _setup(app, directory, **kwargs):
+    timings = SwaggerTimings()
+    setup_swagger(app, shared_cache_dir=directory, trace=timings, **kwargs)
+    built = [event.details["built"] for event in timings.phases
+             if event.phase == "shared_cache"]
+    return built, "parse_docs" in timings.phase_durations()
+
+
+def _worker(directory):
+    app = _app()
+    built, _ = _setup(app, directory)
+    return built[0], app["SWAGGER_DEF"].body.body
+
+
+def test_fingerprint():
+    assert fingerprint_routes(_app()) == fingerprint_routes(_app())
+    assert (fingerprint_routes(_app(), title="A") !=
+            fingerprint_routes(_app(), title="B"))
+
+    async def pong(request):
+        """
+        ---
+        description: pong
+        """
+
+    async def pong_2(request):
+        """
+        ---
+        description: pong 2
+        """
+
+    app_1, app_2 = _app(), _app()
+    app_1.router.add_route('GET', "/pong", pong)
+    app_2.router.add_route('GET', "/pong", pong_2)
+    assert fingerprint_routes(app_1) != fingerprint_routes(app_2)
+    assert fingerprint_routes(app_1) != fingerprint_routes(_app())
+
+
+async def test_shared_definition(aiohttp_client, loop, tmpdir):
+    directory = str(tmpdir.join("shared"))
+
+    first = _app()
+    assert _setup(first, directory) == ([True], True)
+    # Other workers load the published definition: nothing is parsed
+    second = web.Application(loop=loop)
+    second.router.add_route('GET', "/ping", ping)
+    second.router.add_route('*', "/class_view", ClassView)
+    assert _setup(second, directory) == ([False], False)
+
+    first_body = first["SWAGGER_DEF"].body
+    second_body = second["SWAGGER_DEF"].body
+    assert first_body.body == second_body.body
+    assert first_body.headers == second_body.headers
+    assert "gzip" in second_body.variants
+
+    client = await aiohttp_client(second)
+    resp = await client.get('/api/doc/swagger.json')
+    assert resp.status == 200
+    result = await resp.json()
+    assert sorted(result["paths"]) == ["/class_view", "/ping"]
+    assert json.loads(second["SWAGGER_DEF_CONTENT"]) == result
+
+    # Another route table is another definition
+    third = _app()
+    third.router.add_route('GET', "/other_ping", ping)
+    assert _setup(third, directory) == ([True], True)
+    assert "/other_ping" in json.loads(third["SWAGGER_DEF"].content)["paths"]
+
+
+def test_one_build_per_host(tmpdir):
+    directory = str(tmpdir)
+    context = multiprocessing.get_context("fork")
+    with context.Pool(4) as pool:
+        results = pool.map(_worker, [directory] * 4)
+
+    assert sum(built for built, _ in results) == 1
+    assert len({body for _, body in results}) == 1
+
+
+async def test_refresh_on_startup(aiohttp_client, loop, tmpdir):
+    app = web.Application(loop=loop)
+    app.router.add_route('GET', "/ping", ping)
+    _setup(app, str(tmpdir), refresh_on_startup=True)
+    assert app["SWAGGER_DEF"].body is None
+
+    app.router.add_route('GET', "/late_ping", ping)
+    client = await aiohttp_client(app)
+    resp = await client.get('/api/doc/swagger.json')
+    assert "/late_ping" in (await resp.json())["paths"]
+
+
+def test_validate_requests_not_shared(tmpdir):
+    with pytest.raises(ValueError):
+        setup_swagger(_app(), shared_cache_dir=str(tmpdir),
+                      validate_requests=True)
+
+
+def test_prune(tmpdir):
+    cache = SharedArtifactCache(str(tmpdir), encodings=(), keep=2)
+    for i in range(4):
+        cache.load("f{}".format(i), lambda: '{"swagger": "2.0"}')
+        os.utime(cache.path("f{}".format(i)) + ".sha256", (i, i))
+    assert cache.prune() == 0
+    assert sorted(os.listdir(str(tmpdir))) == [
+        "swagger-f2.json", "swagger-f2.json.lock", "swagger-f2.json.sha256",
+        "swagger-f3.json", "swagger-f3.json.lock", "swagger-f3.json.sha256",
+    ]
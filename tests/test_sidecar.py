@@ -0,0 +1,79 @@
+import pytest
+from aiohttp import web
+from aiohttp_swagger import *
+from aiohttp_swagger import __main__
+from aiohttp_swagger.__main__ import main, sidecar_app
+
+from .test_swagger import ClassView, ping
+
+
+def app_factory():
+    app = web.Application()
+    app.router.add_route('GET', "/ping", ping)
+    app.router.add_route('*', "/class_view", ClassView)
+    return app
+
+
+def _sidecar(monkeypatch, loop, argv):
+    # Parsed as `serve` would, without running the server
+    served = []
+    monkeypatch.setattr(__main__, "_serve", served.append)
+    main(["serve"] + argv)
+    return sidecar_app(served[0], loop)
+
+
+async def test_create_swagger_app(aiohttp_client, loop):
+    api_app = app_factory()
+    routes = len(api_app.router.routes())
+    sidecar = create_swagger_app(api_app, title="Sidecar")
+
+    # Nothing is added to the API
+    assert "SWAGGER_DEF" not in api_app
+    assert len(api_app.router.routes()) == routes
+    assert not sidecar.middlewares
+
+    client = await aiohttp_client(sidecar)
+    resp = await client.get('/api/doc/swagger.json')
+    assert resp.status == 200
+    result = await resp.json()
+    assert result["info"]["title"] == "Sidecar"
+    assert sorted(result["paths"]) == ["/class_view", "/ping"]
+    resp = await client.get('/api/doc')
+    assert resp.status == 200
+    resp = await client.get('/api/doc/swagger_static/index.html')
+    assert resp.status == 200
+
+    # Routes added afterwards
+    api_app.router.add_route('GET', "/late_ping", ping)
+    assert refresh_swagger(sidecar)
+    resp = await client.get('/api/doc/swagger.json')
+    assert "/late_ping" in (await resp.json())["paths"]
+
+
+def test_validate_requests_on_the_api():
+    with pytest.raises(ValueError):
+        create_swagger_app(app_factory(), validate_requests=True)
+
+
+async def test_serve_artifact(aiohttp_client, loop, tmpdir, monkeypatch):
+    output = str(tmpdir.join("swagger.json"))
+    main(["build", "tests.test_sidecar:app_factory", "-o", output])
+
+    sidecar = _sidecar(monkeypatch, loop, [output, "--swagger-url", "/doc"])
+    client = await aiohttp_client(sidecar)
+    resp = await client.get('/doc/swagger.json')
+    assert resp.status == 200
+    assert await resp.read() == tmpdir.join("swagger.json").read_binary()
+
+
+@pytest.mark.parametrize("argv", [[], ["--static-in-memory", "--compress"]])
+async def test_serve_app(aiohttp_client, loop, monkeypatch, argv):
+    sidecar = _sidecar(monkeypatch, loop, ["tests.test_sidecar:app_factory",
+                                           "--title", "Served"] + argv)
+    client = await aiohttp_client(sidecar)
+    resp = await client.get('/api/doc/swagger.json')
+    result = await resp.json()
+    assert result["info"]["title"] == "Served"
+    assert sorted(result["paths"]) == ["/class_view", "/ping"]
+    resp = await client.get('/api/doc/swagger_static/index.html')
+    assert resp.status == 200
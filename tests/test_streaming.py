@@ -0,0 +1,113 @@
+import json
+import tracemalloc
+
+from aiohttp import web
+from aiohttp_swagger import *
+from aiohttp_swagger.helpers.serialization import CHUNK_SIZE
+
+from .test_swagger import ClassView, ping
+
+
+class _Response(object):
+    """StreamResponse keeping only the size of what is written"""
+
+    def __init__(self):
+        self.size = 0
+
+    async def write(self, data):
+        self.size += len(data)
+
+
+def _large_app(routes=2000):
+    app = web.Application()
+    for i in range(routes):
+        async def handler(request):
+            pass
+        handler.__doc__ = """
+        ---
+        description: Operation {} {}
+        responses:
+          "200":
+            description: OK
+        """.format(i, "x" * 1000)
+        app.router.add_route('GET', "/resource/{}".format(i), handler)
+    return app
+
+
+def _streamed_json(streamed):
+    return json.loads(b"".join(streamed.chunks()).decode("utf-8"))
+
+
+def _peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_streamed_memory_ceiling(loop):
+    app = _large_app()
+    setup_swagger(app, swagger_def_stream=True)
+    swagger_def = app["SWAGGER_DEF"]
+    # Nothing serialized is kept
+    assert swagger_def.content is None
+    assert swagger_def.index.path_fragments == {}
+
+    body = swagger_def.body
+    size = int(body.headers["Content-Length"])
+    assert size > 2 * 1024 * 1024
+
+    response = _Response()
+    peak = _peak_memory(
+        lambda: loop.run_until_complete(body.write_to(response)))
+    assert response.size == size
+    # A few chunks and path items in flight, never the whole document
+    assert peak < 4 * CHUNK_SIZE
+
+
+async def test_streamed_swagger_def(aiohttp_client, loop):
+    app = web.Application(loop=loop)
+    app.router.add_route('GET', "/ping", ping)
+    app.router.add_route('*', "/class_view", ClassView)
+    setup_swagger(app, swagger_def_stream=True)
+    assert app["SWAGGER_DEF_CONTENT"] is None
+
+    client = await aiohttp_client(app)
+    resp = await client.get('/api/doc/swagger.json')
+    assert resp.status == 200
+    assert resp.headers["Content-Type"] == "application/json; charset=utf-8"
+    body = await resp.read()
+    assert resp.headers["Content-Length"] == str(len(body))
+    result = json.loads(body.decode("utf-8"))
+    assert sorted(result["paths"]) == ["/class_view", "/ping"]
+
+    plain = web.Application(loop=loop)
+    plain.router.add_route('GET', "/ping", ping)
+    plain.router.add_route('*', "/class_view", ClassView)
+    setup_swagger(plain)
+    assert body == plain["SWAGGER_DEF"].body.body
+    assert resp.headers["ETag"] == plain["SWAGGER_DEF"].body.etag
+
+    resp = await client.get('/api/doc/swagger.json',
+                            headers={"If-None-Match": resp.headers["ETag"]})
+    assert resp.status == 304
+
+    resp = await client.head('/api/doc/swagger.json')
+    assert resp.status == 200
+    assert resp.headers["Content-Length"] == str(len(body))
+
+
+def test_streamed_body_unaffected_by_refresh():
+    app = web.Application()
+    app.router.add_route('GET', "/ping", ping)
+    setup_swagger(app, swagger_def_stream=True)
+    streamed = app["SWAGGER_DEF"].body
+
+    app.router.add_route('*', "/class_view", ClassView)
+    assert refresh_swagger(app)
+    assert app["SWAGGER_DEF"].body is not streamed
+    assert sorted(_streamed_json(streamed)["paths"]) == ["/ping"]
+    assert sorted(_streamed_json(app["SWAGGER_DEF"].body)["paths"]) == [
+        "/class_view", "/ping"]
@@ -1,4 +1,6 @@
+import asyncio
 import json
+import re
 import pytest
 import yaml
 from os.path import join, dirname, abspath
@@ -377,3 +379,124 @@ async def test_sub_app(aiohttp_client, loop):
     assert "/class_view" in result['paths']
     assert "get" in result['paths']["/class_view"]
     assert "post" in result['paths']["/class_view"]
+
+
+async def test_swagger_def_etag(aiohttp_client, loop):
+    app = web.Application(loop=loop)
+    app.router.add_route('GET', "/ping", ping)
+    setup_swagger(app, swagger_def_cache_control="max-age=60")
+
+    client = await aiohttp_client(app)
+    resp1 = await client.get('/api/doc/swagger.json')
+    assert resp1.status == 200
+    assert resp1.headers["Cache-Control"] == "max-age=60"
+    etag = resp1.headers["ETag"]
+    last_modified = resp1.headers["Last-Modified"]
+
+    resp2 = await client.get('/api/doc/swagger.json',
+                             headers={"If-None-Match": etag})
+    assert resp2.status == 304
+    assert resp2.headers["ETag"] == etag
+    assert await resp2.read() == b""
+
+    resp3 = await client.head('/api/doc/swagger.json',
+                              headers={"If-None-Match": 'W/' + etag})
+    assert resp3.status == 304
+
+    resp4 = await client.get('/api/doc/swagger.json',
+                             headers={"If-None-Match": '"other"'})
+    assert resp4.status == 200
+
+    resp5 = await client.get('/api/doc/swagger.json',
+                             headers={"If-Modified-Since": last_modified})
+    assert resp5.status == 304
+
+
+async def test_swagger_def_etag_is_stable(aiohttp_client, loop):
+    etags = []
+    for _ in range(2):
+        app = web.Application(loop=loop)
+        app.router.add_route('GET', "/ping", ping)
+        app.router.add_route('*', "/class_view", ClassView)
+        setup_swagger(app)
+        etags.append(app["SWAGGER_DEF"].body.etag)
+    assert etags[0] == etags[1]
+
+
+async def test_static_fingerprint(aiohttp_client, loop):
+    app = web.Application(loop=loop)
+    setup_swagger(app, ui_version=3, static_fingerprint=True)
+
+    client = await aiohttp_client(app)
+    resp = await client.get('/api/doc')
+    assert resp.status == 200
+    assert resp.headers["Cache-Control"] == "no-cache"
+    html = await resp.text()
+    assert '/swagger_static/swagger-ui-bundle.js"' not in html
+
+    bundle = re.search(
+        r'/api/doc/swagger_static/(swagger-ui-bundle\.[0-9a-f]{12}\.js)',
+        html).group(1)
+    resp = await client.get('/api/doc/swagger_static/' + bundle)
+    assert resp.status == 200
+    assert resp.headers["Cache-Control"] == \
+        "public, max-age=31536000, immutable"
+
+    resp = await client.get('/api/doc/swagger_static/swagger-ui-bundle.js')
+    assert resp.status == 200
+    assert "Cache-Control" not in resp.headers
+
+    resp = await client.get(
+        '/api/doc/swagger_static/swagger-ui-bundle.000000000000.js')
+    assert resp.status == 404
+
+
+async def test_lazy_build(aiohttp_client, loop, monkeypatch):
+    import aiohttp_swagger
+    calls = []
+    build_index = aiohttp_swagger.build_swagger_index
+
+    def _counting_build_index(*args, **kwargs):
+        calls.append(1)
+        return build_index(*args, **kwargs)
+
+    monkeypatch.setattr(aiohttp_swagger, "build_swagger_index",
+                        _counting_build_index)
+
+    app = web.Application(loop=loop)
+    app.router.add_route('GET', "/ping", ping)
+    setup_swagger(app, build="lazy")
+    # Routes added after setup_swagger are part of a lazy build
+    app.router.add_route('*', "/class_view", ClassView)
+    assert not calls
+    assert "SWAGGER_DEF_CONTENT" not in app
+
+    client = await aiohttp_client(app)
+    responses = await asyncio.gather(*[
+        client.get('/api/doc/swagger.json') for _ in range(5)])
+    assert len(calls) == 1
+    for resp in responses:
+        assert resp.status == 200
+        result = await resp.json()
+        assert sorted(result['paths']) == ["/class_view", "/ping"]
+
+
+async def test_background_build(aiohttp_client, loop):
+    app = web.Application(loop=loop)
+    app.router.add_route('GET', "/ping", ping)
+    setup_swagger(app, build="background")
+    assert app["SWAGGER_DEF"].body is None
+
+    client = await aiohttp_client(app)
+    await app["SWAGGER_DEF"].start()
+    assert app["SWAGGER_DEF"].body is not None
+
+    resp = await client.get('/api/doc/swagger.json')
+    assert resp.status == 200
+    result = await resp.json()
+    assert '/ping' in result['paths']
+
+
+def test_unknown_build_mode():
+    with pytest.raises(ValueError):
+        setup_swagger(web.Application(), build="later")
@@ -0,0 +1,74 @@
+from aiohttp import web
+from aiohttp_swagger import *
+from aiohttp_swagger.helpers import (PhaseEvent, RouteEvent, SwaggerTimings,
+                                     generate_doc_from_each_end_point)
+
+from .test_swagger import ClassView, ping, ping_partial
+
+
+def _app():
+    app = web.Application()
+    app.router.add_route('GET', "/ping", ping)
+    app.router.add_route('GET', "/ping-again", ping)
+    app.router.add_route('*', "/class_view", ClassView)
+    app.router.add_route('GET', "/ping-partial", ping_partial)
+    return app
+
+
+def test_setup_swagger_trace():
+    timings = SwaggerTimings()
+    setup_swagger(_app(), trace=timings, tag_shards=True)
+
+    assert all(isinstance(event, PhaseEvent) for event in timings.phases)
+    assert [event.phase for event in timings.phases] == [
+        "base_document", "collect_routes", "parse_docs", "serialize_paths",
+        "serialize", "tag_shards", "build"]
+    durations = timings.phase_durations()
+    assert durations["build"] >= durations["parse_docs"] >= 0
+
+    routes = {(event.method, event.path): event for event in timings.routes}
+    assert sorted(routes) == [
+        ("get", "/class_view"), ("get", "/ping"), ("get", "/ping-again"),
+        ("get", "/ping-partial"), ("post", "/class_view")]
+
+    ping_event = routes[("get", "/ping")]
+    assert ping_event.handler == "tests.test_swagger.ping"
+    assert ping_event.source == "docstring"
+    assert ping_event.bytes > 0
+    assert not ping_event.cached
+    # The same docstring is only parsed once
+    assert routes[("get", "/ping-again")].cached
+    assert routes[("get", "/ping-again")].duration == 0.0
+
+    assert routes[("post", "/class_view")].handler == \
+        "tests.test_swagger.ClassView.post"
+    assert routes[("get", "/ping-partial")].source == "file"
+
+    slowest = timings.slowest(2)
+    assert len(slowest) == 2
+    assert slowest[0].duration >= slowest[1].duration
+    assert "slowest of 5 operations" in timings.summary(2)
+
+
+def test_generate_doc_trace():
+    events = []
+    generate_doc_from_each_end_point(_app(), trace=events.append)
+    assert len([event for event in events
+                if isinstance(event, RouteEvent)]) == 5
+    assert events[-1].phase == "serialize"
+
+
+def test_refresh_trace():
+    timings = SwaggerTimings()
+    app = _app()
+    setup_swagger(app, trace=timings)
+    del timings.phases[:], timings.routes[:]
+
+    assert not refresh_swagger(app)
+    app.router.add_route('GET', "/added", ping)
+    assert refresh_swagger(app)
+
+    assert [event.details for event in timings.phases
+            if event.phase == "refresh"] == [{"paths": 0}, {"paths": 1}]
+    assert [(event.path, event.cached) for event in timings.routes] == [
+        ("/added", False)]
@@ -0,0 +1,229 @@
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp_swagger import *
+from aiohttp_swagger.helpers.validation import ValidatorCompiler
+
+from .test_swagger import ping
+
+
+DEFINITIONS = {
+    "User": {
+        "type": "object",
+        "required": ["name"],
+        "additionalProperties": False,
+        "properties": {
+            "name": {"type": "string", "minLength": 1, "maxLength": 20},
+            "age": {"type": "integer", "minimum": 0,
+                    "exclusiveMaximum": True, "maximum": 150},
+            "email": {"type": "string", "pattern": "^[^@]+@[^@]+$",
+                      "x-nullable": True},
+            "friends": {"type": "array", "maxItems": 2,
+                        "items": {"$ref": "#/definitions/User"}},
+        },
+    },
+}
+
+
+async def search_users(request):
+    """
+    ---
+    parameters:
+    - in: query
+      name: limit
+      type: integer
+      minimum: 1
+      maximum: 100
+      default: 10
+    - in: query
+      name: ids
+      type: array
+      items:
+        type: integer
+    - in: query
+      name: sort
+      type: string
+      enum: ["name", "age"]
+      required: true
+    - in: header
+      name: X-Dry-Run
+      type: boolean
+    responses:
+      "200":
+        description: the users
+    """
+    return web.json_response(request["swagger_params"])
+
+
+async def update_user(request):
+    """
+    ---
+    parameters:
+    - in: path
+      name: id
+      type: integer
+      required: true
+    - in: body
+      name: user
+      required: true
+      schema:
+        $ref: '#/definitions/User'
+    responses:
+      "200":
+        description: the user
+    """
+    return web.json_response(request["swagger_params"])
+
+
+def _app(loop, **kwargs):
+    app = web.Application(loop=loop)
+    app.router.add_route('GET', "/ping", ping)
+    app.router.add_route('GET', "/users", search_users)
+    app.router.add_route('PUT', "/users/{id}", update_user)
+    setup_swagger(app, definitions=DEFINITIONS, validate_requests=True,
+                  **kwargs)
+    return app
+
+
+async def _errors(resp):
+    assert resp.status == 400
+    assert resp.headers["Content-Type"].startswith("application/json")
+    return {(error["path"], error["message"])
+            for error in (await resp.json())["errors"]}
+
+
+async def test_validate_parameters(aiohttp_client, loop):
+    client = await aiohttp_client(_app(loop))
+
+    resp = await client.get('/users', params={"sort": "age", "ids": "1,2"},
+                            headers={"X-Dry-Run": "true"})
+    assert resp.status == 200
+    assert await resp.json() == {"limit": 10, "ids": [1, 2], "sort": "age",
+                                 "X-Dry-Run": True}
+
+    resp = await client.get('/users', params={"limit": "0", "ids": "1,x"})
+    assert await _errors(resp) == {
+        ("query/limit", "must be >= 1"),
+        ("query/ids", "is not a valid integer"),
+        ("query/sort", "is required"),
+    }
+
+    resp = await client.get('/users', params={"limit": "ten",
+                                              "sort": "email"})
+    assert await _errors(resp) == {
+        ("query/limit", "is not a valid integer"),
+        ("query/sort", "is not one of ['name', 'age']"),
+    }
+
+    # Undocumented parameters of the end-point are ignored
+    resp = await client.get('/ping', params={"limit": "ten"})
+    assert resp.status == 200
+
+
+async def test_validate_body(aiohttp_client, loop):
+    client = await aiohttp_client(_app(loop))
+
+    user = {"name": "Jane", "age": 40, "email": None,
+            "friends": [{"name": "John", "email": "john@example.com"}]}
+    resp = await client.put('/users/1', json=user)
+    assert resp.status == 200
+    assert await resp.json() == {"id": 1, "user": user}
+
+    resp = await client.put('/users/x', json={
+        "name": "", "age": 150, "email": "nope", "admin": True,
+        "friends": [{}, {"name": 1}, {"name": "Third"}]})
+    assert await _errors(resp) == {
+        ("path/id", "is not a valid integer"),
+        ("body/name", "is shorter than 1"),
+        ("body/age", "must be < 150"),
+        ("body/email", "does not match '^[^@]+@[^@]+$'"),
+        ("body/admin", "is not allowed"),
+        ("body/friends", "has more than 2 items"),
+        ("body/friends/0/name", "is required"),
+        ("body/friends/1/name", "is not of type string"),
+    }
+
+    resp = await client.put('/users/1', data=b"{not json",
+                            headers={"Content-Type": "application/json"})
+    assert await _errors(resp) == {("body", "is not valid JSON")}
+
+    resp = await client.put('/users/1')
+    assert await _errors(resp) == {("body", "is required")}
+
+    resp = await client.put('/users/1', json=[])
+    assert await _errors(resp) == {("body", "is not of type object")}
+
+
+async def test_validate_lazy_build(aiohttp_client, loop):
+    app = _app(loop, build="lazy")
+    client = await aiohttp_client(app)
+    assert app["SWAGGER_DEF"].validators is None
+
+    resp = await client.get('/users')
+    assert await _errors(resp) == {("query/sort", "is required")}
+
+
+def test_validators_follow_refresh():
+    app = web.Application()
+    app.router.add_route('GET', "/users", search_users)
+    setup_swagger(app, validate_requests=True)
+    validators = app["SWAGGER_DEF"].validators
+    route = next(iter(app["SWAGGER_DEF"].index.routes))
+    first = validators.get(route, "GET")
+    assert first is not None
+
+    app.router.add_route('PUT', "/users/{id}", update_user)
+    with pytest.raises(ValueError):
+        # The body references a definition which does not exist
+        refresh_swagger(app)
+
+    app = web.Application()
+    app.router.add_route('GET', "/users", search_users)
+    setup_swagger(app, definitions=DEFINITIONS, validate_requests=True)
+    route = next(iter(app["SWAGGER_DEF"].index.routes))
+    first = app["SWAGGER_DEF"].validators.get(route, "GET")
+    app.router.add_route('PUT', "/users/{id}", update_user)
+    assert refresh_swagger(app)
+    # Unchanged routes keep their compiled validator
+    assert app["SWAGGER_DEF"].validators.get(route, "GET") is first
+
+
+def test_validate_needs_routes():
+    with pytest.raises(ValueError):
+        setup_swagger(web.Application(), swagger_info={"paths": {}},
+                      validate_requests=True)
+
+
+def test_compile_openapi3_operation():
+    compiler = ValidatorCompiler({"components": {"schemas": {
+        "Tag": {"type": "string", "enum": ["a", "b"]},
+    }}})
+    validator = compiler.compile_operation({
+        "parameters": [{"in": "query", "name": "tags", "schema": {
+            "type": "array", "items": {"$ref": "#/components/schemas/Tag"},
+        }}],
+        "requestBody": {"required": False, "content": {"application/json": {
+            "schema": {"type": "object", "additionalProperties": {
+                "type": "number", "multipleOf": 0.5}},
+        }}},
+    })
+    assert validator.has_body
+
+    errors = []
+    query = _MultiDict([("tags", "a"), ("tags", "c")])
+    params = validator.function(query, {}, {}, {}, None,
+                                {"x": 1.5, "y": 0.2}, errors)
+    assert sorted(errors) == [("body/y", "is not a multiple of 0.5"),
+                              ("query/tags/1", "is not one of ['a', 'b']")]
+    assert params["tags"] == ["a", "c"]
+    assert json.loads(json.dumps(params["body"])) == {"x": 1.5, "y": 0.2}
+
+
+class _MultiDict(object):
+    def __init__(self, items):
+        self.items = items
+
+    def getall(self, key, default):
+        values = [value for name, value in self.items if name == key]
+        return values or default
@@ -0,0 +1,30 @@
+from glob import glob
+from os.path import abspath, dirname, join
+
+import pytest
+import yaml
+from aiohttp_swagger.helpers.yaml_loader import libyaml_available, load_yaml
+
+from .test_swagger import ClassView, ping, users_with_data_def
+
+TESTS_PATH = abspath(join(dirname(__file__)))
+
+
+def _documents():
+    for path in sorted(glob(join(TESTS_PATH, "data", "*.yaml"))):
+        with open(path) as f:
+            yield f.read()
+    for handler in (ping, users_with_data_def, ClassView.get):
+        yield handler.__doc__.split("---")[1]
+
+
+@pytest.mark.skipif(not libyaml_available(), reason="libyaml is not available")
+@pytest.mark.parametrize("document", list(_documents()))
+def test_libyaml_and_pure_python_loaders_agree(document):
+    assert load_yaml(document, loader=yaml.CSafeLoader) == \
+        load_yaml(document, loader=yaml.SafeLoader)
+
+
+def test_load_yaml_is_safe():
+    with pytest.raises(yaml.YAMLError):
+        load_yaml("!!python/object/apply:os.system ['true']")